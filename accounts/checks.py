@@ -0,0 +1,28 @@
+# accounts/checks.py
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Cache backends that every process keeps to itself
+PER_PROCESS_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches)
+def check_session_cache(app_configs, **kwargs):
+    """accounts.sessions serves sessions from the cache, so it must be shared"""
+    if settings.SESSION_ENGINE != 'accounts.sessions':
+        return []
+    backend = settings.CACHES.get(settings.SESSION_CACHE_ALIAS, {}).get('BACKEND')
+    if backend in PER_PROCESS_CACHES:
+        return [Error(
+            f"The '{settings.SESSION_CACHE_ALIAS}' cache ({backend}) is not shared between processes.",
+            hint=(
+                'accounts.sessions would let workers serve sessions other workers have '
+                'changed or flushed. Point SESSION_CACHE_BACKEND at Redis or Memcached, '
+                'or use the default database session engine.'
+            ),
+            id='accounts.E001',
+        )]
+    return []
@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import wishlist
+
+
+def wishlist_count(request):
+    """Number of wishlist items, only counted when a template shows it"""
+    return {
+        'wishlist_count': SimpleLazyObject(lambda: wishlist.count(request.user)),
+    }
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from accounts.sessions import purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired sessions in small batches (run from cron instead of '
+        'clearsessions; safe to interrupt and run again)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches, to leave room for request writes',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for count in purge_expired(batch_size=options['batch_size'], pause=options['pause']):
+            total += count
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Deleted {total} so far')
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} expired sessions'))
@@ -6,4 +6,19 @@ class CustomUser(AbstractUser):
     address = models.TextField(blank=True)
     
     def __str__(self):
-        return self.email if self.email else self.username
\ No newline at end of file
+        return self.email if self.email else self.username
+
+class WishlistItem(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='wishlist_items')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        constraints = [
+            # Also the index behind the "is it in my wishlist" lookup
+            models.UniqueConstraint(fields=['user', 'product'], name='wishlist_user_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.product}"
@@ -0,0 +1,85 @@
+# accounts/sessions.py
+"""
+Opt-in session engine (SESSION_ENGINE = 'accounts.sessions'), for use
+with a cache shared by all workers (see accounts.checks): Django's cached_db
+sessions, read from the cache and only falling back to django_session on
+a miss, that also skip the write when nothing actually changed.
+
+Views set session.modified = True freely (the cart views did it on every
+request), and every such save rewrites the django_session row, which
+SQLite serializes. Here save() compares the serialized data with what
+was loaded and returns early when they match. An unchanged session is
+still written once every SESSION_REFRESH_INTERVAL seconds so that its
+expiry date keeps moving for active visitors.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from gulshop import metrics
+
+# When the session was last written (seconds since the epoch); not part
+# of the change check
+WRITTEN_KEY = '_session_written'
+
+
+class SessionStore(CachedDBStore):
+    _loaded_digest = None
+
+    def _digest(self, data):
+        data = {key: value for key, value in data.items() if key != WRITTEN_KEY}
+        return hashlib.sha256(self.serializer().dumps(data)).hexdigest()
+
+    def load(self):
+        self._cache_missed = False
+        data = super().load()
+        if not self._cache_missed:
+            metrics.inc(metrics.CACHE_REQUESTS, cache='sessions', result='hit')
+        self._loaded_digest = self._digest(data) if data else None
+        return data
+
+    def _get_session_from_db(self):
+        # Only called when the cache didn't have the session
+        self._cache_missed = True
+        metrics.inc(metrics.CACHE_REQUESTS, cache='sessions', result='miss')
+        return super()._get_session_from_db()
+
+    def _is_unchanged(self):
+        if self._loaded_digest is None or self._digest(self._session) != self._loaded_digest:
+            return False
+        age = time.time() - self._session.get(WRITTEN_KEY, 0)
+        return age < getattr(settings, 'SESSION_REFRESH_INTERVAL', 60 * 60 * 24)
+
+    def save(self, must_create=False):
+        if not must_create and self.session_key is not None and self._is_unchanged():
+            metrics.inc(metrics.SESSION_SAVES, result='skipped')
+            return
+        metrics.inc(metrics.SESSION_SAVES, result='written')
+        self._session[WRITTEN_KEY] = int(time.time())
+        super().save(must_create=must_create)
+        self._loaded_digest = self._digest(self._session)
+
+
+def purge_expired(batch_size=1000, now=None, pause=0):
+    """
+    Delete expired django_session rows, one short transaction per batch
+    so that request writes are never blocked for long. Yields the number
+    deleted per batch; stopping midway loses nothing, and running it
+    again carries on with what is left.
+    """
+    now = now or timezone.now()
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now)
+            .order_by('expire_date')
+            .values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            return
+        yield Session.objects.filter(session_key__in=keys).delete()[0]
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,11 @@
+# accounts/signals.py
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from . import wishlist
+
+
+@receiver(user_logged_in)
+def merge_session_wishlist(sender, request, user, **kwargs):
+    if request is not None:
+        wishlist.merge_session(request, user)
@@ -1,3 +1,151 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from products.models import Category, Product
+from . import sessions, wishlist
+from .context_processors import wishlist_count
+from .models import WishlistItem
+from .sessions import SessionStore
+
+
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        self.cache = caches['sessions']
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        store = SessionStore()
+        store['cart'] = {'1': 2}
+        store.save()
+        self.key = store.session_key
+
+    def cached(self):
+        return self.cache.get(SessionStore.cache_key_prefix + self.key)
+
+    def stored(self):
+        return SessionStore().decode(Session.objects.get(session_key=self.key).session_data)
+
+    def test_unmodified_session_is_not_written(self):
+        store = SessionStore(self.key)
+        self.assertEqual(store['cart'], {'1': 2})
+        # Views mark the session modified without changing anything
+        store['cart'] = {'1': 2}
+        with self.assertNumQueries(0):
+            store.save()
+        written = self.stored()[sessions.WRITTEN_KEY]
+        self.assertEqual(self.cached()[sessions.WRITTEN_KEY], written)
+
+    def test_modified_session_goes_to_cache_and_database(self):
+        store = SessionStore(self.key)
+        store['cart'] = {'1': 3}
+        store.save()
+        self.assertEqual(self.cached()['cart'], {'1': 3})
+        self.assertEqual(self.stored()['cart'], {'1': 3})
+        # A fresh store (another worker) sees the change
+        self.assertEqual(SessionStore(self.key)['cart'], {'1': 3})
+
+    def test_cache_miss_falls_back_to_the_database(self):
+        self.cache.clear()
+        store = SessionStore(self.key)
+        self.assertEqual(store['cart'], {'1': 2})
+        self.assertEqual(self.cached()['cart'], {'1': 2})
+
+    def test_unchanged_session_is_refreshed_after_the_interval(self):
+        store = SessionStore(self.key)
+        later = store[sessions.WRITTEN_KEY] + 60 * 60 * 24 + 1
+        with self.settings(SESSION_REFRESH_INTERVAL=60 * 60 * 24), \
+                mock.patch('accounts.sessions.time.time', return_value=later):
+            store.save()
+        # Written again so that the expiry date keeps moving
+        self.assertEqual(self.stored()[sessions.WRITTEN_KEY], later)
+        self.assertEqual(self.cached()[sessions.WRITTEN_KEY], later)
+
+
+class PurgeExpiredTests(TestCase):
+    def test_only_expired_rows_are_removed(self):
+        now = timezone.now()
+        for n in range(5):
+            Session.objects.create(session_key=f'old{n}', session_data='', expire_date=now - timedelta(days=n + 1))
+        for n in range(3):
+            Session.objects.create(session_key=f'new{n}', session_data='', expire_date=now + timedelta(days=n + 1))
+
+        self.assertEqual(list(sessions.purge_expired(batch_size=2, now=now)), [2, 2, 1])
+        self.assertEqual(sorted(Session.objects.values_list('session_key', flat=True)), ['new0', 'new1', 'new2'])
+        self.assertEqual(list(sessions.purge_expired(now=now)), [])
+
+
+class WishlistTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Gul', slug='gul')
+        self.rose, self.tulip = (
+            Product.objects.create(category=category, name=name, slug=name.lower(), price=10)
+            for name in ('Rose', 'Tulip')
+        )
+        self.user = get_user_model().objects.create_user(username='a', password='x')
+
+    def make_request(self, user=None, session=None):
+        request = RequestFactory().get('/')
+        request.session = session if session is not None else DBSessionStore()
+        request.user = user or AnonymousUser()
+        return request
+
+    def saved(self):
+        return set(WishlistItem.objects.filter(user=self.user).values_list('product_id', flat=True))
+
+    def test_add_and_remove(self):
+        self.assertTrue(wishlist.add(self.user, self.rose.pk))
+        self.assertFalse(wishlist.add(self.user, self.rose.pk))
+        self.assertTrue(wishlist.contains(self.user, self.rose.pk))
+        self.assertFalse(wishlist.contains(self.user, self.tulip.pk))
+        self.assertEqual(self.saved(), {self.rose.pk})
+        self.assertTrue(wishlist.remove(self.user, self.rose.pk))
+        self.assertFalse(wishlist.remove(self.user, self.rose.pk))
+        self.assertEqual(self.saved(), set())
+
+    def test_login_merges_the_session_wishlist(self):
+        session = self.client.session
+        session['wishlist'] = [self.rose.pk, str(self.tulip.pk)]
+        session.save()
+        self.client.login(username='a', password='x')
+        self.assertEqual(self.saved(), {self.rose.pk, self.tulip.pk})
+        self.assertNotIn('wishlist', self.client.session)
+
+    def test_merge_skips_items_already_saved(self):
+        wishlist.add(self.user, self.rose.pk)
+        request = self.make_request(self.user)
+        # Duplicates within the session and against the table
+        request.session['wishlist'] = [self.rose.pk, str(self.rose.pk), self.tulip.pk, str(self.tulip.pk)]
+        self.assertEqual(wishlist.merge_session(request), 1)
+        self.assertEqual(self.saved(), {self.rose.pk, self.tulip.pk})
+        self.assertEqual(WishlistItem.objects.count(), 2)
+        # Only once: the session list is gone
+        self.assertEqual(wishlist.merge_session(request), 0)
+
+    def test_merge_skips_stale_and_junk_ids(self):
+        request = self.make_request(self.user)
+        request.session['wishlist'] = [self.rose.pk, 999999, 'junk', None]
+        self.assertEqual(wishlist.merge_session(request), 1)
+        self.assertEqual(self.saved(), {self.rose.pk})
+
+    def test_merge_waits_for_login(self):
+        request = self.make_request()
+        request.session['wishlist'] = [self.rose.pk]
+        self.assertEqual(wishlist.merge_session(request), 0)
+        self.assertEqual(request.session['wishlist'], [self.rose.pk])
+
+    def test_context_processor_counts_lazily(self):
+        wishlist.add(self.user, self.rose.pk)
+        wishlist.add(self.user, self.tulip.pk)
+        with self.assertNumQueries(0):
+            context = wishlist_count(self.make_request(self.user))
+        with self.assertNumQueries(1):
+            self.assertEqual(context['wishlist_count'], 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(wishlist_count(self.make_request())['wishlist_count'], 0)
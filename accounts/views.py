@@ -8,6 +8,10 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from .forms import CustomUserCreationForm
 from .models import CustomUser
 from django.contrib import messages
+from django.http import JsonResponse
+from products.models import Product
+from . import wishlist
+from orders.stats import get_stats
 
 class SignUpView(generic.CreateView):
     form_class = CustomUserCreationForm
@@ -20,16 +24,18 @@ def profile_view(request):
     user = request.user
     context = {
         'user': user,
+        'order_stats': get_stats(user),
     }
     return render(request, 'accounts/profile.html', context)
 
 @login_required
 def wishlist_view(request):
     """User wishlist view"""
-    # For now, we'll use session-based wishlist. You can modify this later for database storage.
-    wishlist_items = request.session.get('wishlist', [])
+    wishlist.merge_session(request)
+    items = list(wishlist.items(request.user))
     context = {
-        'wishlist_items': wishlist_items,
+        'wishlist_items': items,
+        'wishlist_total': sum(item.product.price for item in items),
     }
     return render(request, 'accounts/wishlist.html', context)
 
@@ -47,44 +53,38 @@ class ProfileUpdateView(LoginRequiredMixin, UpdateView):
         messages.success(self.request, 'Profile updated successfully!')
         return super().form_valid(form)
 
+def _wishlist_response(request, success, message, level=messages.success):
+    # product_detail toggles the heart with fetch() and wants JSON back
+    if request.content_type == 'application/json' or request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'success': success, 'message': message})
+    level(request, message)
+    return None
+
 @login_required
 def add_to_wishlist(request, product_id):
-    """Add product to wishlist (session-based)"""
-    if 'wishlist' not in request.session:
-        request.session['wishlist'] = []
-    
-    wishlist = request.session['wishlist']
-    
-    # Check if product is already in wishlist
-    if product_id not in wishlist:
-        wishlist.append(product_id)
-        request.session['wishlist'] = wishlist
-        request.session.modified = True
-        messages.success(request, 'Product added to wishlist!')
+    """Add product to wishlist"""
+    product = get_object_or_404(Product, pk=product_id)
+    wishlist.merge_session(request)
+    if wishlist.add(request.user, product.pk):
+        response = _wishlist_response(request, True, 'Product added to wishlist!')
     else:
-        messages.info(request, 'Product already in wishlist!')
-    
-    return redirect(request.META.get('HTTP_REFERER', 'home'))
+        response = _wishlist_response(request, True, 'Product already in wishlist!', messages.info)
+    return response or redirect(request.META.get('HTTP_REFERER', 'home'))
 
 @login_required
 def remove_from_wishlist(request, product_id):
     """Remove product from wishlist"""
-    if 'wishlist' in request.session:
-        wishlist = request.session['wishlist']
-        if str(product_id) in wishlist:
-            wishlist.remove(str(product_id))
-            request.session['wishlist'] = wishlist
-            request.session.modified = True
-            messages.success(request, 'Product removed from wishlist!')
-    
-    return redirect('wishlist')
+    wishlist.merge_session(request)
+    removed = wishlist.remove(request.user, product_id)
+    message = 'Product removed from wishlist!' if removed else 'Product was not in your wishlist.'
+    response = _wishlist_response(request, True, message, messages.success if removed else messages.info)
+    return response or redirect('wishlist')
 
 @login_required
 def clear_wishlist(request):
     """Clear all items from wishlist"""
-    if 'wishlist' in request.session:
-        request.session['wishlist'] = []
-        request.session.modified = True
+    wishlist.merge_session(request)
+    if wishlist.clear(request.user):
         messages.success(request, 'Wishlist cleared successfully!')
     
-    return redirect('wishlist')
\ No newline at end of file
+    return redirect('wishlist')
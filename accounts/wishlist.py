@@ -0,0 +1,67 @@
+# accounts/wishlist.py
+"""
+Database wishlist (WishlistItem) for logged-in users.
+
+Wishlists used to live in request.session['wishlist'] as a mix of int
+and str product ids. merge_session() moves such a list into the table
+once, on login or on the first wishlist access afterwards.
+"""
+from products.models import Product
+from .models import WishlistItem
+
+SESSION_KEY = 'wishlist'
+
+
+def merge_session(request, user=None):
+    """Move a legacy session wishlist into WishlistItem rows, once; returns how many were new"""
+    user = user or request.user
+    legacy = request.session.get(SESSION_KEY)
+    if legacy is None or not user.is_authenticated:
+        return 0
+    ids = set()
+    for value in legacy if isinstance(legacy, list) else []:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    saved = WishlistItem.objects.filter(user=user).values('product_id')
+    missing = Product.objects.filter(pk__in=ids).exclude(pk__in=saved).values_list('pk', flat=True)
+    # ignore_conflicts covers a concurrent merge or add of the same product
+    created = WishlistItem.objects.bulk_create(
+        [WishlistItem(user=user, product_id=pk) for pk in missing],
+        ignore_conflicts=True,
+    )
+    del request.session[SESSION_KEY]
+    return len(created)
+
+
+def add(user, product_id):
+    """True if the product was added, False if it already was there"""
+    _, created = WishlistItem.objects.get_or_create(user=user, product_id=product_id)
+    return created
+
+
+def remove(user, product_id):
+    return WishlistItem.objects.filter(user=user, product_id=product_id).delete()[0] > 0
+
+
+def clear(user):
+    return WishlistItem.objects.filter(user=user).delete()[0]
+
+
+def contains(user, product_id):
+    """One lookup on the (user, product) unique index"""
+    if not user.is_authenticated:
+        return False
+    return WishlistItem.objects.filter(user=user, product_id=product_id).exists()
+
+
+def count(user):
+    if not user.is_authenticated:
+        return 0
+    return WishlistItem.objects.filter(user=user).count()
+
+
+def items(user):
+    """The user's wishlist with products and categories, in one query"""
+    return WishlistItem.objects.filter(user=user).select_related('product__category')
@@ -1,3 +1,17 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Cart, CartLine
+
+
+class CartLineInline(admin.TabularInline):
+    model = CartLine
+    raw_id_fields = ['product']
+    extra = 0
+
+
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_display = ['user', 'created_at']
+    search_fields = ['user__username', 'user__email']
+    raw_id_fields = ['user']
+    inlines = [CartLineInline]
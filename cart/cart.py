@@ -1,34 +1,265 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from django.utils.functional import cached_property
+
+from products.models import Product
+from .models import Cart as SavedCart, CartLine as SavedCartLine
+
+# Most units of one product a single line may hold
+MAX_QUANTITY = 10
+
+
+def normalize_quantity(value):
+    """
+    Return the integer quantity stored for a cart line.
+    Older sessions stored {'quantity': n, ...} dicts, newer ones a plain int.
+    """
+    if isinstance(value, dict):
+        value = value.get('quantity', 1)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_quantities(cart):
+    """Split a {key: quantity} cart into ({product_id: quantity}, [bad keys])"""
+    quantities = {}
+    missing = []
+    for key, value in cart.items():
+        quantity = normalize_quantity(value)
+        try:
+            product_id = int(key)
+        except (TypeError, ValueError):
+            product_id = None
+        if product_id is None or quantity < 1:
+            missing.append(key)
+        else:
+            quantities[product_id] = quantity
+    return quantities, missing
+
+
+@dataclass(frozen=True)
+class CartLine:
+    product: Product
+    quantity: int
+    total: Decimal
+
+
+@dataclass(frozen=True)
+class CartSnapshot:
+    """Priced, read-only view of a cart at one point in time"""
+    lines: tuple = ()
+    total_price: Decimal = Decimal('0.00')
+    total_items: int = 0
+    # Cart keys that no longer point at a product (deleted or garbage)
+    missing_keys: tuple = ()
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
 
 class Cart:
+    """
+    Session cart for anonymous visitors, cart.models.Cart/CartLine rows
+    for signed-in users (so it follows them across devices). self.cart is
+    the same {product_id (str): quantity} mapping either way; for users
+    it is read from the rows, and changes are single UPDATE/INSERT/DELETE
+    statements instead of a rewrite of the whole session.
+    """
     def __init__(self, request):
         self.session = request.session
-        cart = self.session.get('cart')
-        if not cart:
-            cart = self.session['cart'] = {}
-        self.cart = cart
-    
-    def add(self, product, quantity=1):
+        user = getattr(request, 'user', None)
+        self.user = user if user is not None and user.is_authenticated else None
+
+    @cached_property
+    def cart(self):
+        if self.user is not None:
+            if 'cart' in self.session:
+                # Signed in before carts were saved, or the login signal
+                # didn't run (e.g. a custom login path)
+                merge_session_cart(self.session, self.user)
+            return {
+                str(product_id): quantity
+                for product_id, quantity in self._lines().values_list('product_id', 'quantity')
+            }
+        # Don't store an empty cart here: that would mark the session as
+        # modified (and write it back) on every page that looks at the cart.
+        return self.session.get('cart') or {}
+
+    def __len__(self):
+        if self.user is None or 'cart' in self.__dict__ or 'cart' in self.session:
+            return len(self.cart)
+        # The header badge on every page: one COUNT on the (cart, product)
+        # index instead of loading the lines. Counted from the rows each
+        # time, so it is right whichever device changed the cart.
+        return self._lines().count()
+
+    def _changed(self):
+        self.__dict__.pop('cart', None)
+
+    def _lines(self):
+        # An IN (subquery) on the user's cart rather than a join, so
+        # UPDATE/DELETE stay single statements against the line rows
+        return SavedCartLine.objects.filter(cart__in=SavedCart.objects.filter(user=self.user).values('pk'))
+
+    def _saved_cart_id(self):
+        saved, _ = SavedCart.objects.get_or_create(user=self.user)
+        return saved.pk
+
+    def add(self, product, quantity=1, maximum=MAX_QUANTITY):
+        """Add quantity units of product, up to maximum on the line"""
+        if self.user is not None:
+            self._changed()
+            added = Least(F('quantity') + quantity, maximum)
+            if self._lines().filter(product=product).update(quantity=added):
+                return
+            with transaction.atomic():
+                line, created = SavedCartLine.objects.get_or_create(
+                    cart_id=self._saved_cart_id(), product=product,
+                    defaults={'quantity': min(quantity, maximum)},
+                )
+                if not created:
+                    # Another request added the line in between
+                    SavedCartLine.objects.filter(pk=line.pk).update(quantity=added)
+            return
+
         product_id = str(product.id)
-        
+
         # ALWAYS store as simple integer (not dictionary)
         if product_id in self.cart:
-            self.cart[product_id] += quantity
+            self.cart[product_id] = min(normalize_quantity(self.cart[product_id]) + quantity, maximum)
         else:
-            self.cart[product_id] = quantity
-        
+            self.cart[product_id] = min(quantity, maximum)
+
         self.save()
-    
+
+    def change_quantity(self, product_id, delta, maximum=MAX_QUANTITY):
+        """
+        Step a line's quantity by delta, up to maximum; a line stepped
+        below 1 is removed. For saved carts this is one conditional
+        UPDATE (or DELETE) of the line's row, so concurrent clicks can't
+        push it past the limits.
+        """
+        if self.user is not None:
+            self._changed()
+            lines = self._lines().filter(product_id=product_id)
+            updated = lines.filter(
+                quantity__gte=1 - delta, quantity__lte=maximum - delta,
+            ).update(quantity=F('quantity') + delta)
+            if not updated and delta < 0:
+                lines.filter(quantity__lt=1 - delta).delete()
+            return
+
+        key = str(product_id)
+        if key not in self.cart:
+            return
+        quantity = normalize_quantity(self.cart[key]) + delta
+        if quantity < 1:
+            self.discard([key])
+        elif quantity <= maximum:
+            self.cart[key] = quantity
+            self.save()
+
     def save(self):
+        if self.user is not None:
+            return
+        self.session['cart'] = self.cart
         self.session.modified = True
-    
+
     def remove(self, product):
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
+        self.discard([str(product.id)])
+
+    def discard(self, keys):
+        """Drop stale cart keys, e.g. CartSnapshot.missing_keys"""
+        removed = [key for key in keys if key in self.cart]
+        for key in removed:
+            del self.cart[key]
+        if not removed:
+            return
+        if self.user is None:
             self.save()
-    
+        else:
+            product_ids = [int(key) for key in removed if key.isdigit()]
+            self._lines().filter(product_id__in=product_ids).delete()
+
     def clear(self):
-        if 'cart' in self.session:
+        self.cart = {}
+        if self.user is not None:
+            self._lines().delete()
+        elif 'cart' in self.session:
             del self.session['cart']
-            self.save()
\ No newline at end of file
+            self.session.modified = True
+
+    def quantities(self):
+        """
+        Return ({product_id: quantity}, [stale cart keys]) without
+        touching the database again.
+        """
+        return parse_quantities(self.cart)
+
+    def snapshot(self, products=None):
+        """
+        Price every line with a single catalog query.
+        Lines keep the order they were added to the cart in.
+        Pass products ({id: Product}) to price against rows already loaded,
+        e.g. locked ones.
+        """
+        quantities, missing = self.quantities()
+        if products is None:
+            products = Product.objects.select_related('category').in_bulk(list(quantities))
+
+        lines = []
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None:
+                missing.append(str(product_id))
+                continue
+            lines.append(CartLine(product=product, quantity=quantity, total=product.price * quantity))
+
+        return CartSnapshot(
+            lines=tuple(lines),
+            total_price=sum((line.total for line in lines), Decimal('0.00')),
+            total_items=sum(line.quantity for line in lines),
+            missing_keys=tuple(missing),
+        )
+
+
+@transaction.atomic
+def merge_session_cart(session, user):
+    """
+    On login, fold the anonymous session cart into the user's saved cart
+    with one batched upsert (quantities of lines in both are added up, up
+    to MAX_QUANTITY like Cart.add), then drop it from the session.
+    """
+    quantities, _ = parse_quantities(session.pop('cart', None) or {})
+    if not quantities:
+        return 0
+
+    saved, _ = SavedCart.objects.get_or_create(user=user)
+    existing = dict(
+        saved.lines.select_for_update()
+        .filter(product_id__in=list(quantities))
+        .values_list('product_id', 'quantity')
+    )
+    product_ids = sorted(Product.objects.filter(pk__in=list(quantities)).values_list('pk', flat=True))
+    SavedCartLine.objects.bulk_create(
+        [
+            SavedCartLine(
+                cart=saved, product_id=pk, quantity=min(quantities[pk] + existing.get(pk, 0), MAX_QUANTITY),
+            )
+            for pk in product_ids
+        ],
+        update_conflicts=True,
+        unique_fields=['cart', 'product'],
+        update_fields=['quantity'],
+    )
+    return len(product_ids)
@@ -1,4 +1,16 @@
+from django.utils.functional import SimpleLazyObject
+
 from .cart import Cart
 
 def cart(request):
-    return {'cart': Cart(request)}
\ No newline at end of file
+    """
+    Expose the cart lazily: the session (or a signed-in user's saved
+    cart) is only read when a template actually uses 'cart' or
+    'cart_count'. A signed-in user's count is a single COUNT query
+    (see Cart.__len__).
+    """
+    cart = SimpleLazyObject(lambda: Cart(request))
+    return {
+        'cart': cart,
+        'cart_count': SimpleLazyObject(lambda: len(cart)),
+    }
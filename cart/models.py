@@ -1,3 +1,28 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class Cart(models.Model):
+    """A signed-in user's cart; anonymous carts stay in the session"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Cart of {self.user}"
+
+
+class CartLine(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=1)
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Lines keep the order they were added to the cart in
+        ordering = ['added_at', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'product'], name='cart_line_product_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product}"
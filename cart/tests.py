@@ -1,3 +1,153 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from products.models import Category, Product
+from .cart import MAX_QUANTITY, Cart, merge_session_cart
+from .models import Cart as SavedCart, CartLine
+
+
+class CartTestMixin:
+    def setUp(self):
+        category = Category.objects.create(name='Gul', slug='gul')
+        self.rose, self.tulip = (
+            Product.objects.create(category=category, name=name, slug=name.lower(), price=10)
+            for name in ('Rose', 'Tulip')
+        )
+        self.user = get_user_model().objects.create_user(username='a', password='x')
+
+    def make_cart(self, user=None, session=None):
+        request = RequestFactory().get('/')
+        request.session = session if session is not None else SessionStore()
+        request.user = user or AnonymousUser()
+        return Cart(request)
+
+    def saved_lines(self):
+        return dict(CartLine.objects.filter(cart__user=self.user).values_list('product_id', 'quantity'))
+
+
+class SessionCartTests(CartTestMixin, TestCase):
+    def test_add_and_re_add(self):
+        cart = self.make_cart()
+        cart.add(self.rose, 2)
+        cart.add(self.rose, 3)
+        self.assertEqual(cart.session['cart'], {str(self.rose.pk): 5})
+
+    def test_add_stops_at_the_maximum(self):
+        cart = self.make_cart()
+        cart.add(self.rose, 7)
+        cart.add(self.rose, 7)
+        self.assertEqual(cart.session['cart'], {str(self.rose.pk): MAX_QUANTITY})
+
+    def test_change_quantity_limits(self):
+        cart = self.make_cart()
+        cart.add(self.rose, MAX_QUANTITY)
+        cart.change_quantity(self.rose.pk, 1)
+        self.assertEqual(cart.cart, {str(self.rose.pk): MAX_QUANTITY})
+        cart.add(self.tulip, 1)
+        cart.change_quantity(self.tulip.pk, -1)
+        self.assertEqual(list(cart.cart), [str(self.rose.pk)])
+
+
+class SavedCartTests(CartTestMixin, TestCase):
+    def test_add_inserts_then_upserts(self):
+        cart = self.make_cart(self.user)
+        cart.add(self.rose, 2)
+        cart.add(self.rose, 3)
+        cart.add(self.tulip)
+        self.assertEqual(self.saved_lines(), {self.rose.pk: 5, self.tulip.pk: 1})
+        self.assertEqual(CartLine.objects.count(), 2)
+        self.assertEqual(cart.cart, {str(self.rose.pk): 5, str(self.tulip.pk): 1})
+
+    def test_change_quantity_limits(self):
+        cart = self.make_cart(self.user)
+        cart.add(self.rose, MAX_QUANTITY)
+        cart.change_quantity(self.rose.pk, 1)
+        self.assertEqual(self.saved_lines(), {self.rose.pk: MAX_QUANTITY})
+        cart.add(self.tulip, 1)
+        cart.change_quantity(self.tulip.pk, -1)
+        self.assertEqual(self.saved_lines(), {self.rose.pk: MAX_QUANTITY})
+
+    def test_add_stops_at_the_maximum(self):
+        cart = self.make_cart(self.user)
+        cart.add(self.rose, MAX_QUANTITY + 5)
+        cart.add(self.tulip, 7)
+        cart.add(self.tulip, 7)
+        self.assertEqual(self.saved_lines(), {self.rose.pk: MAX_QUANTITY, self.tulip.pk: MAX_QUANTITY})
+
+    def test_count_is_one_query(self):
+        self.make_cart(self.user).add(self.rose)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(self.make_cart(self.user)), 1)
+
+    def test_count_follows_changes_from_other_devices(self):
+        phone, laptop = SessionStore(), SessionStore()
+        self.make_cart(self.user, phone).add(self.rose)
+        self.assertEqual(len(self.make_cart(self.user, laptop)), 1)
+        changes = [
+            lambda cart: cart.add(self.tulip),
+            lambda cart: cart.change_quantity(self.tulip.pk, -1),
+            lambda cart: cart.add(self.tulip),
+            lambda cart: cart.remove(self.tulip),
+            lambda cart: cart.clear(),
+        ]
+        for change, count in zip(changes, [2, 1, 2, 1, 0]):
+            change(self.make_cart(self.user, phone))
+            self.assertEqual(len(self.make_cart(self.user, laptop)), count)
+            self.assertEqual(len(self.make_cart(self.user, phone)), count)
+
+    def test_clear(self):
+        cart = self.make_cart(self.user)
+        cart.add(self.rose)
+        cart.clear()
+        self.assertEqual(self.saved_lines(), {})
+        self.assertEqual(len(self.make_cart(self.user)), 0)
+
+
+class MergeSessionCartTests(CartTestMixin, TestCase):
+    def test_login_merges_the_session_cart(self):
+        session = self.client.session
+        session['cart'] = {str(self.rose.pk): 2, str(self.tulip.pk): 1}
+        session.save()
+        self.client.login(username='a', password='x')
+        self.assertEqual(self.saved_lines(), {self.rose.pk: 2, self.tulip.pk: 1})
+        self.assertNotIn('cart', self.client.session)
+
+    def test_merge_adds_up_lines_in_both(self):
+        self.make_cart(self.user).add(self.rose, 2)
+        session = SessionStore()
+        session['cart'] = {str(self.rose.pk): 3, str(self.tulip.pk): {'quantity': 1}}
+        self.assertEqual(merge_session_cart(session, self.user), 2)
+        self.assertEqual(self.saved_lines(), {self.rose.pk: 5, self.tulip.pk: 1})
+        self.assertEqual(SavedCart.objects.count(), 1)
+
+    def test_merge_stops_at_the_maximum(self):
+        self.make_cart(self.user).add(self.rose, 6)
+        session = SessionStore()
+        session['cart'] = {str(self.rose.pk): 6, str(self.tulip.pk): MAX_QUANTITY + 3}
+        merge_session_cart(session, self.user)
+        self.assertEqual(self.saved_lines(), {self.rose.pk: MAX_QUANTITY, self.tulip.pk: MAX_QUANTITY})
+
+    def test_count_includes_an_unmerged_session_cart(self):
+        self.make_cart(self.user).add(self.rose)
+        session = SessionStore()
+        session['cart'] = {str(self.tulip.pk): 1}
+        self.assertEqual(len(self.make_cart(self.user, session)), 2)
+        self.assertNotIn('cart', session)
+
+    def test_merge_skips_stale_keys(self):
+        session = SessionStore()
+        session['cart'] = {str(self.rose.pk): 1, '999999': 1, 'junk': 1, str(self.tulip.pk): 0}
+        self.assertEqual(merge_session_cart(session, self.user), 1)
+        self.assertEqual(self.saved_lines(), {self.rose.pk: 1})
+
+    def test_empty_session_cart_is_a_no_op(self):
+        self.assertEqual(merge_session_cart(SessionStore(), self.user), 0)
+        self.assertFalse(SavedCart.objects.exists())
+
+    def test_saved_cart_picks_up_a_leftover_session_cart(self):
+        session = SessionStore()
+        session['cart'] = {str(self.rose.pk): 1}
+        self.assertEqual(self.make_cart(self.user, session).cart, {str(self.rose.pk): 1})
+        self.assertNotIn('cart', session)
@@ -5,34 +5,12 @@ from .cart import Cart
 
 def cart_detail(request):
     cart = Cart(request)
-    
-    items = []
-    for product_id, quantity in cart.cart.items():
-        try:
-            product = Product.objects.get(id=product_id)
-            
-            # FIX: Handle if quantity is dict or int
-            if isinstance(quantity, dict):
-                qty = quantity.get('quantity', 1)
-            else:
-                qty = quantity
-            
-            total_price = product.price * qty
-            items.append({
-                'product': product,
-                'quantity': qty,
-                'total': total_price
-            })
-        except Product.DoesNotExist:
-            continue
-    
-    total_price = sum(item['total'] for item in items)
-    total_items = sum(item['quantity'] for item in items)
+    snapshot = cart.snapshot()
     
     return render(request, 'cart/detail.html', {
-        'cart_items': items,
-        'total_price': total_price,
-        'total_items': total_items
+        'cart_items': snapshot.lines,
+        'total_price': snapshot.total_price,
+        'total_items': snapshot.total_items
     })
 
 def add_to_cart(request, product_id):
@@ -1,3 +1,10 @@
+"""
+ASGI entry point, e.g. `uvicorn gulshop.asgi:application`.
+
+Serve at least orders:status from here: its long-poll mode holds requests
+open while waiting for a status change, which under ASGI costs a
+coroutine instead of a worker.
+"""
 import os
 from django.core.asgi import get_asgi_application
 
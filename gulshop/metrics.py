@@ -0,0 +1,322 @@
+# gulshop/metrics.py
+"""
+Request metrics in the Prometheus text format, served at /metrics.
+
+MetricsMiddleware counts every request by route (resolver_match.view_name,
+e.g. products:product_detail, so label values stay bounded), method and
+status. For a sample of requests (METRICS_SAMPLE_RATE) it also records
+latency, SQL query count and time (connection.execute_wrapper; sync views
+only) and template render time (TimedDjangoTemplates, which includes
+queries run from templates). products.catalog and accounts.sessions add
+cache hits/misses and session writes.
+
+Values are aggregated per process. With several workers (gunicorn), set
+METRICS_DIR: every process then dumps its totals to a file there every
+METRICS_FLUSH_INTERVAL seconds and on exit, and /metrics adds up all the
+files. Files of stopped workers are kept so that counters never go down;
+empty the directory when the app is (re)deployed.
+"""
+import atexit
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import sync_and_async_middleware
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+REQUESTS = 'gulshop_http_requests_total'
+LATENCY = 'gulshop_http_request_duration_seconds'
+QUERIES = 'gulshop_db_queries_per_request'
+QUERY_TIME = 'gulshop_db_query_duration_seconds'
+TEMPLATE_TIME = 'gulshop_template_render_duration_seconds'
+CACHE_REQUESTS = 'gulshop_cache_requests_total'
+SESSION_SAVES = 'gulshop_session_saves_total'
+
+# name: (type, buckets, help)
+METRICS = {
+    REQUESTS: ('counter', None, 'Requests by route, method and status'),
+    LATENCY: ('histogram', TIME_BUCKETS, 'Request latency, sampled requests'),
+    QUERIES: ('histogram', QUERY_BUCKETS, 'SQL queries per sampled request'),
+    QUERY_TIME: ('histogram', TIME_BUCKETS, 'SQL time per sampled request'),
+    TEMPLATE_TIME: ('histogram', TIME_BUCKETS, 'Template render time per sampled request'),
+    CACHE_REQUESTS: ('counter', None, 'Cache lookups by cache and result'),
+    SESSION_SAVES: ('counter', None, 'Session saves, written or skipped as unchanged'),
+}
+
+# Route label of requests no URL pattern matched
+UNMATCHED = '<unmatched>'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+# {(name, ((label, value), ...)): float, or [per-bucket counts..., +Inf count, sum]}
+_values = {}
+_process_file = None
+_last_flush = 0.0
+
+
+def _start_process():
+    global _lock, _process_file, _last_flush
+    _lock = threading.Lock()
+    _values.clear()
+    _process_file = f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+    _last_flush = 0.0
+
+
+_start_process()
+# Workers forked from a preloaded app (gunicorn --preload) start afresh
+os.register_at_fork(after_in_child=_start_process)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    buckets = METRICS[name][1]
+    key = _key(name, labels)
+    with _lock:
+        counts = _values.get(key)
+        if counts is None:
+            counts = _values[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[len(buckets)] += 1
+        counts[-1] += value
+
+
+# ===== PER-REQUEST MEASUREMENTS =====
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+    template_seconds: float = 0.0
+
+
+_current = ContextVar('metrics_request', default=None)
+
+
+def _sampled():
+    rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+    return rate >= 1 or random.random() < rate
+
+
+def _time_queries(stats):
+    def wrapper(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats.queries += 1
+            stats.query_seconds += time.perf_counter() - start
+    return wrapper
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else UNMATCHED
+
+
+def _record(request, response, start, stats):
+    route = _route(request)
+    if route == 'metrics':
+        return
+    inc(REQUESTS, route=route, method=request.method, status=str(response.status_code))
+    if stats is not None:
+        observe(LATENCY, time.perf_counter() - start, route=route)
+        observe(QUERIES, stats.queries, route=route)
+        observe(QUERY_TIME, stats.query_seconds, route=route)
+        observe(TEMPLATE_TIME, stats.template_seconds, route=route)
+    flush()
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    """Put it first in MIDDLEWARE so that latency covers the whole stack"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            stats = RequestStats() if _sampled() else None
+            token = _current.set(stats)
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            _record(request, response, start, stats)
+            return response
+    else:
+        def middleware(request):
+            start = time.perf_counter()
+            stats = RequestStats() if _sampled() else None
+            token = _current.set(stats)
+            try:
+                with ExitStack() as stack:
+                    if stats is not None:
+                        for connection in connections.all():
+                            stack.enter_context(connection.execute_wrapper(_time_queries(stats)))
+                    response = get_response(request)
+            finally:
+                _current.reset(token)
+            _record(request, response, start, stats)
+            return response
+    return middleware
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing renders for MetricsMiddleware"""
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+# ===== AGGREGATION ACROSS PROCESSES =====
+def _snapshot():
+    with _lock:
+        return [
+            [name, list(labels), list(value) if isinstance(value, list) else value]
+            for (name, labels), value in _values.items()
+        ]
+
+
+def _metrics_dir():
+    path = getattr(settings, 'METRICS_DIR', None)
+    return Path(path) if path else None
+
+
+def flush(force=False):
+    """Write this process's totals to METRICS_DIR (at most every interval)"""
+    global _last_flush
+    directory = _metrics_dir()
+    now = time.monotonic()
+    if directory is None or not _values:
+        return
+    if not force and now - _last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+        return
+    _last_flush = now
+    directory.mkdir(parents=True, exist_ok=True)
+    temporary = directory / f'.{_process_file}.tmp'
+    temporary.write_text(json.dumps(_snapshot()))
+    os.replace(temporary, directory / _process_file)
+
+
+atexit.register(flush, force=True)
+
+
+def _merge(totals, rows):
+    for name, labels, value in rows:
+        key = (name, tuple(tuple(pair) for pair in labels))
+        if isinstance(value, list):
+            counts = totals.get(key)
+            if counts is None:
+                totals[key] = list(value)
+            elif len(counts) == len(value):
+                # (bucket layouts only differ across deploys)
+                totals[key] = [a + b for a, b in zip(counts, value)]
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def collect():
+    """Totals of this process plus every other process's last flush"""
+    totals = {}
+    directory = _metrics_dir()
+    if directory is not None and directory.is_dir():
+        for path in directory.glob('*.json'):
+            if path.name == _process_file:
+                continue
+            try:
+                _merge(totals, json.loads(path.read_text()))
+            except (OSError, ValueError):
+                # Being replaced right now, or left half-written by a crash
+                continue
+    _merge(totals, _snapshot())
+    return totals
+
+
+# ===== TEXT FORMAT =====
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(totals):
+    lines = []
+    for name, (kind, buckets, help_text) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in totals.items() if metric == name)
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), value):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(value[-1])}')
+            lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Scrapers must send METRICS_TOKEN as
+    "Authorization: Bearer <token>"; with no token configured the
+    endpoint is closed.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token or not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
@@ -0,0 +1,158 @@
+# gulshop/routers.py
+"""
+Read replica routing, active when DATABASES has a 'replica' alias.
+
+Writes always go to 'default' (the primary). Reads go to the replica for
+the catalog (the products app) and for whatever runs inside
+`with use_replica():`, such as the order history page. Everything else
+reads the primary, as does any read inside a transaction on the primary
+or inside `with use_primary():`.
+
+Read-your-writes: PinPrimaryMiddleware gives a client that just wrote
+(e.g. placed an order) a short-lived cookie, and its requests read the
+primary until it expires (REPLICA_PIN_SECONDS), so the new order shows up
+in its history even while the replica lags behind. Writes are recognized
+by the statements the primary runs, not by db_for_write(), which Django
+also asks when a related object is merely assigned.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+PIN_COOKIE = 'pin_primary'
+
+# Apps whose reads always go to the replica
+REPLICA_APPS = {'products'}
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+# Writes to these tables don't pin a client to the primary
+UNPINNED_TABLES = ('django_session',)
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_pinned = ContextVar('pinned', default=False)
+# Write statements run on the primary during the current request
+_writes = ContextVar('writes', default=None)
+
+
+def has_replica():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Send reads of every app to the replica (unless pinned)"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary, whatever the app"""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not has_replica() or _pinned.get() or connections[PRIMARY].in_atomic_block:
+            return None
+        if model._meta.app_label in REPLICA_APPS or _replica_reads.get():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both sides
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # The replica is a copy of the primary, schema included
+        return False if db == REPLICA else None
+
+
+def _record_writes(execute, sql, params, many, context):
+    writes = _writes.get()
+    if (
+        writes is not None
+        and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+        and not any(table in sql for table in UNPINNED_TABLES)
+    ):
+        writes.append(sql)
+    return execute(sql, params, many, context)
+
+
+def _watch(connection):
+    if _record_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_writes)
+
+
+def _watch_new_connection(sender, connection, **kwargs):
+    # Covers the threads async views run their queries in
+    if connection.alias == PRIMARY:
+        _watch(connection)
+
+
+connection_created.connect(_watch_new_connection)
+
+
+def _pinned_by(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _pin(response, writes):
+    if writes:
+        seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+        response.set_cookie(
+            PIN_COOKIE, str(int(time.time() + seconds)),
+            max_age=seconds, httponly=True, samesite='Lax',
+        )
+    return response
+
+
+@sync_and_async_middleware
+def PinPrimaryMiddleware(get_response):
+    """Read from the primary for a few seconds after a client's writes"""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            if not has_replica():
+                return await get_response(request)
+            writes = []
+            pinned, recorded = _pinned.set(_pinned_by(request)), _writes.set(writes)
+            try:
+                response = await get_response(request)
+            finally:
+                _pinned.reset(pinned)
+                _writes.reset(recorded)
+            return _pin(response, writes)
+    else:
+        def middleware(request):
+            if not has_replica():
+                return get_response(request)
+            _watch(connections[PRIMARY])
+            writes = []
+            pinned, recorded = _pinned.set(_pinned_by(request)), _writes.set(writes)
+            try:
+                response = get_response(request)
+            finally:
+                _pinned.reset(pinned)
+                _writes.reset(recorded)
+            return _pin(response, writes)
+    return middleware
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from datetime import timedelta
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,16 +26,20 @@ INSTALLED_APPS = [
     'products',
     'cart',
     'orders',
+    'inventory',
+    'jobs',
     'accounts',
     'about',
 ]
 
 MIDDLEWARE = [
+    'gulshop.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'gulshop.routers.PinPrimaryMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -43,7 +48,8 @@ ROOT_URLCONF = 'gulshop.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times renders for /metrics
+        'BACKEND': 'gulshop.metrics.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -53,6 +59,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'cart.context_processors.cart',
+                'accounts.context_processors.wishlist_count',
             ],
         },
     },
@@ -60,13 +67,96 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'gulshop.wsgi.application'
 
+# Applied to every new SQLite connection. WAL lets readers carry on while
+# a write is in progress; synchronous=NORMAL is durable in WAL mode except
+# for the last commits before a power loss; busy_timeout makes a writer
+# wait for the lock (ms) instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -32000,  # KiB
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        # Keep connections open between requests (seconds), checking them
+        # before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts; otherwise concurrent
+            # checkouts that read and then reserve stock fail with "database is
+            # locked" instead of waiting their turn.
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+        # A file rather than the default in-memory database: tests that
+        # check out from many threads need real locking (shared-cache
+        # memory databases fail at once instead of waiting for the lock)
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Optional read replica (gulshop.routers): catalog and order history reads
+# go there, everything else to 'default'. To try it locally with two
+# SQLite files, copy the database and point DATABASE_REPLICA_PATH at the
+# copy, refreshing it now and then to play a lagging replica:
+#   sqlite3 db.sqlite3 ".backup replica.sqlite3"
+if os.environ.get('DATABASE_REPLICA_PATH'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['DATABASE_REPLICA_PATH'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['gulshop.routers.ReplicaRouter']
+
+# After a write, a client reads from the primary for this many seconds
+REPLICA_PIN_SECONDS = 10
+
+# Use a shared backend (Redis/Memcached) in production so that every worker
+# sees the same catalog version and warm_catalog_cache is effective.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Backs the opt-in accounts.sessions engine below. Kept apart from
+    # 'default' so that clearing the catalog cache doesn't send every
+    # session back to the database.
+    'sessions': {
+        'BACKEND': os.environ.get('SESSION_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('SESSION_CACHE_LOCATION', 'sessions'),
+    },
+}
+
+# Plain database sessions by default. SESSION_ENGINE=accounts.sessions
+# reads sessions from the 'sessions' cache (cached_db) and skips saves
+# that wouldn't change anything. It needs a cache every worker shares
+# (SESSION_CACHE_BACKEND/SESSION_CACHE_LOCATION, e.g. Redis or
+# Memcached): with a per-process one, a worker would serve a session that
+# another has since changed or flushed. A system check enforces this.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+SESSION_CACHE_ALIAS = 'sessions'
+# accounts.sessions still rewrites an unchanged session this often
+# (seconds), to push its expiry date forward. Expired rows are deleted by
+# purge_sessions.
+SESSION_REFRESH_INTERVAL = 60 * 60 * 24
+
+# Seconds a catalog listing stays cached (entries are also invalidated by
+# version bumps on every Product/Category save or delete)
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Bump when templates/products/product_detail.html changes: it is part of
+# the cached product body key and of the product page ETag
+PRODUCT_DETAIL_TEMPLATE_VERSION = 1
+
+# Product cards per listing page (keyset paginated)
+PRODUCTS_PER_PAGE = 24
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -94,6 +184,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Widths (px) of the responsive copies made for every product image
+PRODUCT_IMAGE_WIDTHS = (240, 480, 960)
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
@@ -101,6 +194,55 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 
 CART_SESSION_ID = 'cart'
 
+# Order numbers (orders.ids). Every process leases a node id slot on its
+# host (file locks in ORDER_ID_LOCK_DIR, default: the temp directory); on
+# multi-host deployments give every host its own ORDER_ID_HOST (0-255).
+# ORDER_ID_NODE (0-65535) pins the node instead and must then be unique
+# per process.
+ORDER_ID_HOST = int(os.environ.get('ORDER_ID_HOST', 0))
+ORDER_ID_NODE = os.environ.get('ORDER_ID_NODE')
+ORDER_ID_LOCK_DIR = os.environ.get('ORDER_ID_LOCK_DIR')
+
+# How long a checkout form's idempotency key is remembered; expired keys
+# are deleted by prune_idempotency_keys.
+CHECKOUT_IDEMPOTENCY_TTL = timedelta(hours=24)
+
+# Background jobs (jobs.queue, run with manage.py run_workers): failed
+# jobs are retried with exponential backoff up to JOBS_MAX_ATTEMPTS times.
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BASE = timedelta(seconds=10)
+JOBS_RETRY_MAX = timedelta(hours=1)
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'Gul Shop <orders@gulshop.local>'
+
+# Long-polling order status (orders.views.order_status, ASGI only): the
+# longest a client may wait for a change, and how often the order is
+# re-read meanwhile.
+ORDER_STATUS_MAX_WAIT = 30
+ORDER_STATUS_POLL_INTERVAL = 1.0
+
+# Delivered/cancelled orders untouched for this long are moved to the
+# archive tables by archive_orders (run it from cron).
+ORDER_ARCHIVE_AFTER = timedelta(days=90)
+
+# Rows per page on My Orders
+ORDERS_PER_PAGE = 20
+
+# How long checkout holds stock for an order that is not confirmed;
+# inventory's release_expired_reservations gives it back afterwards.
+STOCK_RESERVATION_TTL = timedelta(hours=48)
+
+# Request metrics (gulshop.metrics, scraped at /metrics). Every request is
+# counted; latency, SQL and template timings are recorded for this share
+# of them. Under several workers set METRICS_DIR to a directory they all
+# share (emptied on deploy). /metrics answers 403 until METRICS_TOKEN is
+# set; the scraper then sends it as a bearer token.
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 1.0))
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 LOGIN_REDIRECT_URL = 'home'
 
 # Logout redirect
@@ -0,0 +1,134 @@
+import os
+import runpy
+import sqlite3
+import tempfile
+import warnings
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders.models import Order
+from products.models import Category, Product
+from .routers import PIN_COOKIE, PRIMARY, REPLICA, use_primary, use_replica
+
+
+class MetricsViewTests(SimpleTestCase):
+    @override_settings(METRICS_TOKEN=None)
+    def test_closed_without_a_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer '}).status_code, 403,
+        )
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_requires_the_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(
+            self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer nope'}).status_code, 403,
+        )
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE gulshop_http_requests_total counter', response.content.decode())
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    A second SQLite file configured through DATABASE_REPLICA_PATH, filled
+    with a copy of the test database: rows written after the copy show
+    which database a read went to.
+    """
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.path = os.path.join(directory.name, 'replica.sqlite3')
+        with mock.patch.dict(os.environ, {'DATABASE_REPLICA_PATH': cls.path}):
+            replica = runpy.run_path(str(Path(settings.BASE_DIR) / 'gulshop' / 'settings.py'))['DATABASES'][REPLICA]
+        with warnings.catch_warnings():
+            # "Overriding setting DATABASES": the alias is registered below
+            warnings.simplefilter('ignore')
+            cls.enterClassContext(override_settings(DATABASES={**settings.DATABASES, REPLICA: replica}))
+        # The alias must exist before the test case checks `databases`
+        connections.settings[REPLICA] = connections.configure_settings(
+            {PRIMARY: connections.settings[PRIMARY], REPLICA: replica}
+        )[REPLICA]
+        cls.addClassCleanup(connections.settings.pop, REPLICA)
+        # Set here rather than on the class: the test runner would otherwise
+        # try to create a test database for the alias before it exists
+        cls.databases = {PRIMARY, REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections.close_all()
+        if hasattr(connections._connections, REPLICA):
+            del connections[REPLICA]
+
+    def setUp(self):
+        self.assertEqual(connections[REPLICA].settings_dict['NAME'], self.path)
+        category = Category.objects.create(name='Gul', slug='gul')
+        self.product = Product.objects.create(category=category, name='Gul', slug='gul', price=10)
+        self.user = get_user_model().objects.create_user(username='a', password='x')
+        self.sync_replica()
+
+    def sync_replica(self):
+        connections[REPLICA].close()
+        connections[PRIMARY].ensure_connection()
+        target = sqlite3.connect(self.path)
+        try:
+            connections[PRIMARY].connection.backup(target)
+        finally:
+            target.close()
+
+    def rename_on_primary(self, name):
+        Product.objects.filter(pk=self.product.pk).update(name=name)
+
+    def test_catalog_reads_go_to_the_replica(self):
+        self.rename_on_primary('Renamed')
+        self.assertEqual(Product.objects.get(pk=self.product.pk).name, 'Gul')
+        self.assertEqual(Product.objects.using(PRIMARY).get(pk=self.product.pk).name, 'Renamed')
+
+    def test_other_reads_and_writes_go_to_the_primary(self):
+        order = Order.objects.create(user=self.user, name='A', phone='1', address='X', total_amount=10)
+        self.assertTrue(Order.objects.filter(pk=order.pk).exists())
+        with use_replica():
+            self.assertFalse(Order.objects.filter(pk=order.pk).exists())
+        created = Product.objects.create(category=self.product.category, name='New', slug='new', price=1)
+        self.assertTrue(Product.objects.using(PRIMARY).filter(pk=created.pk).exists())
+        self.assertFalse(Product.objects.using(REPLICA).filter(pk=created.pk).exists())
+
+    def test_use_primary_and_transactions_read_the_primary(self):
+        self.rename_on_primary('Renamed')
+        with use_primary():
+            self.assertEqual(Product.objects.get(pk=self.product.pk).name, 'Renamed')
+        with use_replica(), use_primary():
+            self.assertEqual(Product.objects.get(pk=self.product.pk).name, 'Renamed')
+        with transaction.atomic():
+            self.assertEqual(Product.objects.get(pk=self.product.pk).name, 'Renamed')
+
+    def replica_queries(self, path):
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        self.client.force_login(self.user)
+        history = reverse('orders:history')
+        self.assertGreater(self.replica_queries(history), 0)
+        self.assertNotIn(PIN_COOKIE, self.client.cookies)
+
+        response = self.client.post(reverse('products:add_to_cart', args=[self.product.pk]), {'quantity': 1})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.replica_queries(history), 0)
+
+    def test_session_writes_do_not_pin(self):
+        response = self.client.post(reverse('products:add_to_cart', args=[self.product.pk]), {'quantity': 1})
+        self.assertNotIn(PIN_COOKIE, response.cookies)
@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from products import views as product_views
+from . import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),  # ✅ Ab admin defined hai
@@ -13,6 +14,7 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
    # path('contact/', include('contact.urls')),
     path('about/', include('about.urls')),
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
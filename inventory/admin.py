@@ -0,0 +1,30 @@
+# inventory/admin.py
+from django.contrib import admin
+from .models import Reservation, StockLevel
+from .services import sync_availability
+
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    list_display = ['product', 'on_hand', 'reserved', 'available', 'updated_at']
+    list_editable = ['on_hand']
+    readonly_fields = ['reserved']
+    raw_id_fields = ['product']
+    search_fields = ['product__name']
+
+    def save_model(self, request, obj, form, change):
+        # Never write back `reserved`: checkouts may have moved it meanwhile
+        if change:
+            obj.save(update_fields=['on_hand', 'updated_at'])
+        else:
+            obj.save()
+        sync_availability([obj.product_id])
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'order', 'quantity', 'status', 'expires_at', 'created_at']
+    list_filter = ['status']
+    raw_id_fields = ['product', 'order']
+    readonly_fields = ['product', 'order', 'quantity', 'status', 'expires_at', 'created_at']
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.services import release_expired
+
+
+class Command(BaseCommand):
+    help = 'Give back stock held by checkouts that were never confirmed (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Released {count} expired reservations'))
@@ -0,0 +1,59 @@
+# inventory/models.py
+from django.db import models
+from django.db.models import F, Q
+
+from products.models import Product
+
+
+class StockLevel(models.Model):
+    """
+    Stock for one product. Products without a StockLevel are not tracked
+    and can always be ordered.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='stock')
+    # Physically in the warehouse, including units held for pending orders
+    on_hand = models.PositiveIntegerField(default=0)
+    # Units held by reservations that are not committed yet
+    reserved = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=Q(reserved__lte=F('on_hand')), name='stock_reserved_lte_on_hand'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} ({self.available} available)"
+
+    @property
+    def available(self):
+        return self.on_hand - self.reserved
+
+
+class Reservation(models.Model):
+    HELD = 'held'
+    COMMITTED = 'committed'
+    EXPIRED = 'expired'
+    RELEASED = 'released'
+    STATUS_CHOICES = [
+        (HELD, 'Held'),
+        (COMMITTED, 'Committed'),
+        (EXPIRED, 'Expired'),
+        (RELEASED, 'Released'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    order = models.ForeignKey('orders.Order', on_delete=models.CASCADE, null=True, blank=True, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # The expiry sweeper only ever looks at held reservations
+            models.Index(fields=['expires_at'], condition=Q(status='held'), name='reservation_held_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product} ({self.status})"
@@ -0,0 +1,204 @@
+# inventory/services.py
+"""
+Stock reservation.
+
+Every stock change is a single conditional UPDATE on the product's
+StockLevel row, e.g.
+
+    UPDATE inventory_stocklevel SET reserved = reserved + 3
+    WHERE product_id = 42 AND on_hand >= reserved + 3
+
+so concurrent checkouts on one hot product only ever contend for that one
+row, and can never oversell it. Rows are always touched in product id
+order, which rules out deadlocks between multi-line orders.
+
+Lifecycle of a Reservation:
+    held      taken at checkout, counts against StockLevel.reserved
+    committed order confirmed: units leave on_hand and reserved
+    expired   not confirmed in time: units go back to available stock,
+              re-taken on confirmation if there is still enough stock
+    released  order cancelled: units go back to available stock
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from products import catalog, search
+from products.models import Product
+from .models import Reservation, StockLevel
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id, requested, available):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        super().__init__(f'Only {available} left of product {product_id} ({requested} requested)')
+
+
+def get_reservation_ttl():
+    return getattr(settings, 'STOCK_RESERVATION_TTL', timedelta(hours=24))
+
+
+def sync_availability(product_ids):
+    """Flip Product.available to match stock for tracked products"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    tracked = Product.objects.filter(pk__in=product_ids, stock__isnull=False)
+    # update() skips auto_now; Product.updated drives the product page
+    # ETag and its cached fragments
+    now = timezone.now()
+    changed = tracked.filter(available=True, stock__on_hand__lte=F('stock__reserved')).update(available=False, updated=now)
+    changed += tracked.filter(available=False, stock__on_hand__gt=F('stock__reserved')).update(available=True, updated=now)
+    if changed:
+        # update() skips the catalog signals
+        search.index_products(Product.objects.filter(pk__in=product_ids).select_related('category'))
+        transaction.on_commit(catalog.bump_version)
+    return changed
+
+
+def _take(product_id, quantity, take_from_on_hand=False):
+    stock = StockLevel.objects.filter(product_id=product_id, on_hand__gte=F('reserved') + quantity)
+    if take_from_on_hand:
+        updated = stock.update(on_hand=F('on_hand') - quantity)
+    else:
+        updated = stock.update(reserved=F('reserved') + quantity)
+    if not updated:
+        available = (
+            StockLevel.objects.filter(product_id=product_id)
+            .values_list(F('on_hand') - F('reserved'), flat=True)
+            .first()
+        )
+        raise OutOfStock(product_id, quantity, max(available or 0, 0))
+
+
+def reserve(quantities, order=None, ttl=None):
+    """
+    Hold stock for {product_id: quantity}. Must run inside a transaction:
+    raises OutOfStock (and the caller's rollback undoes earlier lines)
+    if any tracked product is short.
+    """
+    tracked = set(
+        StockLevel.objects.filter(product_id__in=list(quantities)).values_list('product_id', flat=True)
+    )
+    expires_at = timezone.now() + (ttl or get_reservation_ttl())
+    reservations = []
+    for product_id in sorted(tracked):
+        _take(product_id, quantities[product_id])
+        reservations.append(Reservation(
+            product_id=product_id,
+            order=order,
+            quantity=quantities[product_id],
+            expires_at=expires_at,
+        ))
+    Reservation.objects.bulk_create(reservations)
+    sync_availability(tracked)
+    return reservations
+
+
+def _totals(reservations):
+    totals = defaultdict(int)
+    for reservation in reservations:
+        totals[reservation.product_id] += reservation.quantity
+    return sorted(totals.items())
+
+
+def commit_order(order):
+    return commit_orders([order.pk])
+
+
+@transaction.atomic
+def commit_orders(order_ids):
+    """
+    The orders are confirmed: held units leave the warehouse for good.
+    Expired reservations are re-taken from available stock; returns the
+    OutOfStock errors for those that can't be.
+    """
+    reservations = list(
+        Reservation.objects.select_for_update()
+        .filter(order_id__in=order_ids, status__in=[Reservation.HELD, Reservation.EXPIRED])
+        .order_by('product_id')
+    )
+    held = [r for r in reservations if r.status == Reservation.HELD]
+    for product_id, quantity in _totals(held):
+        StockLevel.objects.filter(product_id=product_id).update(
+            on_hand=F('on_hand') - quantity, reserved=F('reserved') - quantity
+        )
+
+    committed = [r.pk for r in held]
+    shortages = []
+    for reservation in reservations:
+        if reservation.status != Reservation.EXPIRED:
+            continue
+        try:
+            with transaction.atomic():
+                _take(reservation.product_id, reservation.quantity, take_from_on_hand=True)
+        except OutOfStock as e:
+            shortages.append(e)
+        else:
+            committed.append(reservation.pk)
+
+    Reservation.objects.filter(pk__in=committed).update(status=Reservation.COMMITTED)
+    sync_availability({r.product_id for r in reservations})
+    return shortages
+
+
+def release_order(order):
+    return release_orders([order.pk])
+
+
+@transaction.atomic
+def release_orders(order_ids):
+    """The orders are cancelled: give back held and committed units"""
+    reservations = list(
+        Reservation.objects.select_for_update()
+        .filter(order_id__in=order_ids, status__in=[Reservation.HELD, Reservation.COMMITTED])
+        .order_by('product_id')
+    )
+    for product_id, quantity in _totals(r for r in reservations if r.status == Reservation.HELD):
+        StockLevel.objects.filter(product_id=product_id).update(reserved=F('reserved') - quantity)
+    for product_id, quantity in _totals(r for r in reservations if r.status == Reservation.COMMITTED):
+        StockLevel.objects.filter(product_id=product_id).update(on_hand=F('on_hand') + quantity)
+
+    Reservation.objects.filter(pk__in=[r.pk for r in reservations]).update(status=Reservation.RELEASED)
+    sync_availability({r.product_id for r in reservations})
+    return len(reservations)
+
+
+def release_expired(batch_size=500, now=None):
+    """
+    Sweep held reservations past their expiry, one short transaction per
+    batch. Returns the number of reservations expired.
+    """
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            expired = list(
+                Reservation.objects.select_for_update(skip_locked=True)
+                .filter(status=Reservation.HELD, expires_at__lte=now)
+                .order_by('expires_at')[:batch_size]
+            )
+            if not expired:
+                return total
+            for product_id, quantity in _totals(expired):
+                StockLevel.objects.filter(product_id=product_id).update(reserved=F('reserved') - quantity)
+            Reservation.objects.filter(pk__in=[r.pk for r in expired]).update(status=Reservation.EXPIRED)
+            sync_availability({r.product_id for r in expired})
+        total += len(expired)
+
+
+@transaction.atomic
+def restock(product, quantity):
+    """Add (or with a negative quantity remove) units on hand"""
+    StockLevel.objects.get_or_create(product=product)
+    if quantity >= 0:
+        StockLevel.objects.filter(product=product).update(on_hand=F('on_hand') + quantity)
+    else:
+        _take(product.pk, -quantity, take_from_on_hand=True)
+    sync_availability([product.pk])
@@ -0,0 +1,27 @@
+# inventory/signals.py
+import logging
+
+from django.dispatch import receiver
+
+from orders.transitions import status_changed
+from . import services
+
+logger = logging.getLogger(__name__)
+
+COMMIT_STATUSES = {'confirmed', 'processing', 'shipped', 'delivered'}
+RELEASE_STATUSES = {'cancelled'}
+
+# Orders per reservation query, to keep IN lists short on bulk transitions
+BATCH_SIZE = 500
+
+
+@receiver(status_changed)
+def settle_reservations(sender, order_ids, status, **kwargs):
+    """Commit or give back the orders' stock when their status moves on"""
+    for start in range(0, len(order_ids), BATCH_SIZE):
+        batch = order_ids[start:start + BATCH_SIZE]
+        if status in COMMIT_STATUSES:
+            for shortage in services.commit_orders(batch):
+                logger.warning('Order confirmed without stock: %s', shortage)
+        elif status in RELEASE_STATUSES:
+            services.release_orders(batch)
@@ -0,0 +1,153 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from orders.models import Order
+from products.models import Category, Product
+from .models import Reservation, StockLevel
+from .services import (
+    OutOfStock, commit_orders, release_expired, release_orders, reserve, restock,
+)
+
+
+def make_product(name='Gul', on_hand=None):
+    category, _ = Category.objects.get_or_create(slug='gul', defaults={'name': 'Gul'})
+    product = Product.objects.create(category=category, name=name, slug=name.lower(), price=10)
+    if on_hand is not None:
+        StockLevel.objects.create(product=product, on_hand=on_hand)
+    return product
+
+
+def make_order():
+    return Order.objects.create(name='A', phone='1', address='X', total_amount=10)
+
+
+class StockTestMixin:
+    def assertStock(self, product, on_hand, reserved, available):
+        stock = StockLevel.objects.get(product=product)
+        product.refresh_from_db()
+        self.assertEqual((stock.on_hand, stock.reserved, product.available), (on_hand, reserved, available))
+
+
+class ReservationTests(StockTestMixin, TestCase):
+    def setUp(self):
+        self.product = make_product(on_hand=5)
+        self.order = make_order()
+
+    def reserve(self, quantity, **kwargs):
+        with transaction.atomic():
+            return reserve({self.product.pk: quantity}, order=self.order, **kwargs)
+
+    def test_reserve_holds_units(self):
+        reservations = self.reserve(3)
+        self.assertEqual([(r.quantity, r.status) for r in reservations], [(3, Reservation.HELD)])
+        self.assertStock(self.product, 5, 3, True)
+
+    def test_reserving_the_last_units_marks_the_product_unavailable(self):
+        self.reserve(5)
+        self.assertStock(self.product, 5, 5, False)
+
+    def test_reserve_more_than_available_fails_and_rolls_back(self):
+        other = make_product('Other', on_hand=1)
+        with self.assertRaises(OutOfStock) as raised:
+            with transaction.atomic():
+                reserve({self.product.pk: 2, other.pk: 2}, order=self.order)
+        self.assertEqual((raised.exception.product_id, raised.exception.available), (other.pk, 1))
+        self.assertStock(self.product, 5, 0, True)
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_untracked_products_are_not_limited(self):
+        untracked = make_product('Untracked')
+        with transaction.atomic():
+            self.assertEqual(reserve({untracked.pk: 1000}), [])
+
+    def test_commit_takes_units_off_hand(self):
+        self.reserve(2)
+        self.assertEqual(commit_orders([self.order.pk]), [])
+        self.assertStock(self.product, 3, 0, True)
+        self.assertEqual(Reservation.objects.get().status, Reservation.COMMITTED)
+
+    def test_commit_retakes_expired_reservations_while_stock_lasts(self):
+        self.reserve(4, ttl=timedelta(seconds=-1))
+        self.assertEqual(release_expired(), 1)
+        self.assertStock(self.product, 5, 0, True)
+        self.assertEqual(commit_orders([self.order.pk]), [])
+        self.assertStock(self.product, 1, 0, True)
+
+    def test_commit_reports_expired_reservations_that_were_sold_meanwhile(self):
+        self.reserve(4, ttl=timedelta(seconds=-1))
+        release_expired()
+        with transaction.atomic():
+            reserve({self.product.pk: 3}, order=make_order())
+        shortages = commit_orders([self.order.pk])
+        self.assertEqual([(e.requested, e.available) for e in shortages], [(4, 2)])
+        self.assertEqual(Reservation.objects.get(order=self.order).status, Reservation.EXPIRED)
+        self.assertStock(self.product, 5, 3, True)
+
+    def test_release_returns_held_units(self):
+        self.reserve(5)
+        self.assertEqual(release_orders([self.order.pk]), 1)
+        self.assertStock(self.product, 5, 0, True)
+        self.assertEqual(Reservation.objects.get().status, Reservation.RELEASED)
+
+    def test_release_returns_committed_units(self):
+        self.reserve(2)
+        commit_orders([self.order.pk])
+        release_orders([self.order.pk])
+        self.assertStock(self.product, 5, 0, True)
+
+    def test_release_expired_only_touches_expired_holds(self):
+        self.reserve(1, ttl=timedelta(seconds=-1))
+        self.reserve(2)
+        self.assertEqual(release_expired(batch_size=1), 1)
+        self.assertStock(self.product, 5, 2, True)
+        self.assertEqual(
+            sorted(Reservation.objects.values_list('quantity', 'status')),
+            [(1, Reservation.EXPIRED), (2, Reservation.HELD)],
+        )
+
+    def test_release_expired_respects_now(self):
+        self.reserve(1)
+        self.assertEqual(release_expired(), 0)
+        self.assertEqual(release_expired(now=timezone.now() + timedelta(days=3)), 1)
+
+    def test_restock(self):
+        self.reserve(5)
+        restock(self.product, 2)
+        self.assertStock(self.product, 7, 5, True)
+        with self.assertRaises(OutOfStock):
+            restock(self.product, -3)
+
+
+class ConcurrentCheckoutTests(StockTestMixin, TransactionTestCase):
+    workers = 200
+    on_hand = 50
+
+    def test_concurrent_checkouts_never_oversell(self):
+        product = make_product(on_hand=self.on_hand)
+        start = threading.Barrier(self.workers)
+
+        def checkout(_):
+            start.wait()
+            try:
+                with transaction.atomic():
+                    reserve({product.pk: 1})
+                return 'ok'
+            except OutOfStock:
+                return 'out'
+            except DatabaseError as e:
+                return f'error: {e}'
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(checkout, range(self.workers)))
+
+        self.assertEqual([r for r in results if r not in ('ok', 'out')], [])
+        self.assertEqual(results.count('ok'), self.on_hand)
+        self.assertEqual(sum(Reservation.objects.values_list('quantity', flat=True)), self.on_hand)
+        self.assertStock(product, self.on_hand, self.on_hand, False)
@@ -0,0 +1,16 @@
+# jobs/admin.py
+from django.contrib import admin
+from .models import Job
+from .queue import retry
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = ['claim', 'claimed_at', 'last_error', 'created_at', 'finished_at']
+    actions = ['retry_jobs']
+
+    @admin.action(description='Retry selected dead jobs')
+    def retry_jobs(self, request, queryset):
+        count = retry(queryset)
+        self.message_user(request, f'{count} jobs queued again.')
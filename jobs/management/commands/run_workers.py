@@ -0,0 +1,125 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs import queue
+
+logger = logging.getLogger('jobs')
+
+
+class _Requeuer:
+    """Calls queue.requeue_stale() at most every interval seconds"""
+    def __init__(self, interval):
+        self.interval = interval
+        self.last = time.monotonic()
+
+    def __call__(self):
+        if time.monotonic() - self.last < self.interval:
+            return 0
+        self.last = time.monotonic()
+        requeued = queue.requeue_stale()
+        if requeued:
+            logger.warning('Requeued %s jobs of workers that died', requeued)
+        return requeued
+
+
+def _work(batch_size, poll, once, requeue_interval=None):
+    """
+    Worker process main loop. requeue_interval is only given when the
+    command runs a single worker in-process, with no supervisor to do it.
+    """
+    requeue = _Requeuer(requeue_interval) if requeue_interval else None
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    processed = 0
+    while not stopping:
+        close_old_connections()
+        if requeue is not None:
+            requeue()
+        jobs = queue.claim(batch_size)
+        if not jobs:
+            if once:
+                break
+            time.sleep(poll)
+            continue
+        for job in jobs:
+            # Finish the batch even when asked to stop: the jobs are claimed
+            queue.run(job)
+            processed += 1
+    connections.close_all()
+    return processed
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed at a time')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to sleep when idle')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of waiting for new jobs',
+        )
+        parser.add_argument(
+            '--requeue-interval', type=float, default=60,
+            help='Seconds between checks for jobs of workers that died',
+        )
+
+    def handle(self, *args, **options):
+        requeued = queue.requeue_stale()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} jobs of workers that died')
+
+        args = (options['batch_size'], options['poll'], options['once'])
+        if options['workers'] <= 1:
+            processed = _work(*args, requeue_interval=options['requeue_interval'])
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} jobs'))
+            return
+
+        # Forked workers must not inherit open database connections
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=_work, args=args, name=f'jobs-worker-{i}')
+            for i in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Started {len(workers)} workers (pid {os.getpid()})')
+
+        requeue = _Requeuer(options['requeue_interval'])
+        try:
+            while any(worker.is_alive() for worker in workers):
+                time.sleep(options['poll'])
+                # Jobs of a worker killed mid-job (OOM, SIGKILL) stay claimed
+                # until the claim times out; hand them back while running
+                requeue()
+                # Workers restarted below are forked and must not inherit
+                # the connection requeue() opened
+                connections.close_all()
+                # Restart workers that crashed rather than exited
+                for i, worker in enumerate(workers):
+                    if not worker.is_alive() and worker.exitcode not in (0, -signal.SIGTERM) and not options['once']:
+                        logger.warning('%s exited with %s, restarting', worker.name, worker.exitcode)
+                        workers[i] = multiprocessing.Process(target=_work, args=args, name=worker.name)
+                        workers[i].start()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
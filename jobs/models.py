@@ -0,0 +1,42 @@
+# jobs/models.py
+from django.db import models
+from django.db.models import Q
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        # Out of attempts; kept for inspection and manual retry
+        (DEAD, 'Dead'),
+    ]
+
+    # Name a function was registered under with jobs.task
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    # Set while a worker has the job
+    claim = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever look for due queued jobs...
+            models.Index(fields=['run_at'], condition=Q(status='queued'), name='job_queued_run_at_idx'),
+            # ...pick up what they just claimed...
+            models.Index(fields=['claim'], condition=Q(status='running'), name='job_running_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,134 @@
+# jobs/queue.py
+"""
+A small job queue in the database.
+
+    from jobs.queue import task, enqueue
+
+    @task('orders.send_confirmation')        # in <app>/tasks.py
+    def send_confirmation(order_id): ...
+
+    enqueue('orders.send_confirmation', order_id=order.pk)
+
+enqueue() inserts a row in the current transaction, so a job exists if
+and only if the work that created it commits; workers can't see it
+before that. enqueue_on_commit() is for callers that want the insert
+after their transaction instead.
+
+Workers (manage.py run_workers) claim due jobs in batches. Candidates are
+selected with SELECT ... FOR UPDATE SKIP LOCKED where the database has it
+and are then taken with a conditional UPDATE that only matches jobs still
+queued, which is what keeps two workers apart on SQLite. A failing job is
+retried with exponential backoff until max_attempts, then left as dead.
+Jobs of a worker that died are requeued after JOBS_CLAIM_TIMEOUT.
+"""
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name, max_attempts=None):
+    """Register a function as a job; its keyword arguments are the payload"""
+    def register(func):
+        _registry[name] = func
+        func.job_name = name
+        func.max_attempts = max_attempts
+        return func
+    return register
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def enqueue(name, delay=None, **payload):
+    if name not in _registry:
+        raise KeyError(f'No job registered as {name!r}')
+    max_attempts = _registry[name].max_attempts or getattr(settings, 'JOBS_MAX_ATTEMPTS', 5)
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + (delay or timedelta()),
+    )
+
+
+def enqueue_on_commit(name, delay=None, **payload):
+    transaction.on_commit(partial(enqueue, name, delay, **payload))
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`: 10s, 20s, 40s, ... capped, with jitter"""
+    base = getattr(settings, 'JOBS_RETRY_BASE', timedelta(seconds=10)).total_seconds()
+    cap = getattr(settings, 'JOBS_RETRY_MAX', timedelta(hours=1)).total_seconds()
+    seconds = min(base * 2 ** (attempts - 1), cap)
+    return timedelta(seconds=seconds * random.uniform(0.8, 1.2))
+
+
+def requeue_stale(now=None):
+    """Give the jobs of workers that died mid-job back to the queue"""
+    now = now or timezone.now()
+    timeout = getattr(settings, 'JOBS_CLAIM_TIMEOUT', timedelta(minutes=10))
+    stale = Job.objects.filter(status=Job.RUNNING, claimed_at__lt=now - timeout)
+    # A job that keeps killing its worker must not be retried forever
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.DEAD, claim='', finished_at=now, last_error='Worker died while running the job',
+    )
+    return stale.update(status=Job.QUEUED, claim='', run_at=now)
+
+
+def claim(batch_size=10, now=None):
+    """Take up to batch_size due jobs for this worker"""
+    now = now or timezone.now()
+    token = uuid.uuid4().hex
+    with transaction.atomic():
+        due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        candidates = list(due.values_list('pk', flat=True)[:batch_size])
+        if not candidates:
+            return []
+        Job.objects.filter(pk__in=candidates, status=Job.QUEUED).update(
+            status=Job.RUNNING, claim=token, claimed_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(status=Job.RUNNING, claim=token).order_by('run_at', 'pk'))
+
+
+def run(job):
+    """Run one claimed job and record the outcome"""
+    try:
+        get_task(job.name)(**job.payload)
+    except Exception as e:
+        error = ''.join(traceback.format_exception(e))
+        if job.attempts >= job.max_attempts:
+            logger.error('Job %s failed for good after %s attempts', job, job.attempts, exc_info=e)
+            updates = {'status': Job.DEAD, 'finished_at': timezone.now()}
+        else:
+            logger.warning('Job %s failed (attempt %s), retrying', job, job.attempts, exc_info=e)
+            updates = {'status': Job.QUEUED, 'run_at': timezone.now() + backoff(job.attempts)}
+        Job.objects.filter(pk=job.pk, claim=job.claim).update(claim='', last_error=error, **updates)
+        return False
+    Job.objects.filter(pk=job.pk, claim=job.claim).update(
+        status=Job.DONE, claim='', finished_at=timezone.now(),
+    )
+    return True
+
+
+def retry(jobs):
+    """Put dead jobs back in the queue with a fresh set of attempts"""
+    return jobs.filter(status=Job.DEAD).update(
+        status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None,
+    )
@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+calls = []
+
+
+@queue.task('jobs.tests.record')
+def record(**payload):
+    calls.append(payload)
+
+
+@queue.task('jobs.tests.fail', max_attempts=3)
+def fail():
+    raise RuntimeError('boom')
+
+
+class ClaimTests(TestCase):
+    def test_claimed_jobs_are_not_claimed_again(self):
+        jobs = [queue.enqueue('jobs.tests.record', n=n) for n in range(5)]
+        first = queue.claim(batch_size=3)
+        second = queue.claim(batch_size=3)
+        self.assertEqual([job.pk for job in first], [job.pk for job in jobs[:3]])
+        self.assertEqual([job.pk for job in second], [job.pk for job in jobs[3:]])
+        self.assertNotEqual(first[0].claim, second[0].claim)
+        self.assertEqual(queue.claim(), [])
+        self.assertEqual({job.attempts for job in first + second}, {1})
+
+    def test_jobs_wait_until_due(self):
+        queue.enqueue('jobs.tests.record', delay=timedelta(minutes=5))
+        self.assertEqual(queue.claim(), [])
+        self.assertEqual(len(queue.claim(now=timezone.now() + timedelta(minutes=6))), 1)
+
+    def test_jobs_are_enqueued_with_the_transaction(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.enqueue_on_commit('jobs.tests.record', n=1)
+            self.assertFalse(Job.objects.exists())
+        self.assertEqual(Job.objects.get().payload, {'n': 1})
+
+
+class ConcurrentClaimTests(TransactionTestCase):
+    def test_workers_never_share_a_job(self):
+        for n in range(60):
+            queue.enqueue('jobs.tests.record', n=n)
+
+        def worker(_):
+            claimed = []
+            try:
+                while jobs := queue.claim(batch_size=4):
+                    claimed.extend(job.pk for job in jobs)
+            finally:
+                connections.close_all()
+            return claimed
+
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(worker, range(4)))
+        claimed = [pk for result in results for pk in result]
+        self.assertEqual(len(claimed), 60)
+        self.assertEqual(len(set(claimed)), 60)
+
+
+@override_settings(JOBS_RETRY_BASE=timedelta(seconds=10), JOBS_RETRY_MAX=timedelta(seconds=60))
+class RetryTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_success_marks_done(self):
+        queue.enqueue('jobs.tests.record', n=1)
+        self.assertTrue(queue.run(queue.claim()[0]))
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.claim), (Job.DONE, ''))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(calls, [{'n': 1}])
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        with mock.patch('jobs.queue.random.uniform', return_value=1):
+            self.assertEqual(
+                [queue.backoff(n).total_seconds() for n in range(1, 6)],
+                [10, 20, 40, 60, 60],
+            )
+        for n in range(1, 4):
+            self.assertTrue(8 * 2 ** (n - 1) <= queue.backoff(n).total_seconds() <= 12 * 2 ** (n - 1))
+
+    def test_failures_back_off_then_die(self):
+        queue.enqueue('jobs.tests.fail')
+        now = timezone.now()
+        with mock.patch('jobs.queue.random.uniform', return_value=1), self.assertLogs('jobs.queue', 'WARNING'):
+            for attempt, delay in ((1, 10), (2, 20)):
+                [job] = queue.claim(now=now)
+                self.assertFalse(queue.run(job))
+                job.refresh_from_db()
+                self.assertEqual((job.status, job.attempts, job.claim), (Job.QUEUED, attempt, ''))
+                self.assertIn('RuntimeError: boom', job.last_error)
+                self.assertAlmostEqual((job.run_at - timezone.now()).total_seconds(), delay, delta=5)
+                # Not due again before the backoff has passed
+                self.assertEqual(queue.claim(now=now), [])
+                now = job.run_at
+
+            [job] = queue.claim(now=now)
+            self.assertFalse(queue.run(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DEAD, 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(queue.claim(now=now + timedelta(days=1)), [])
+
+        self.assertEqual(queue.retry(Job.objects.all()), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.finished_at), (Job.QUEUED, 0, None))
+
+
+@override_settings(JOBS_CLAIM_TIMEOUT=timedelta(minutes=10))
+class RequeueStaleTests(TestCase):
+    def test_stale_running_jobs_go_back_to_the_queue(self):
+        queue.enqueue('jobs.tests.record', n=1)
+        queue.enqueue('jobs.tests.record', n=2)
+        now = timezone.now()
+        stale, fresh = queue.claim(now=now)
+        dead_claim = stale.claim
+        Job.objects.filter(pk=stale.pk).update(claimed_at=now - timedelta(minutes=11))
+
+        self.assertEqual(queue.requeue_stale(now), 1)
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((stale.status, stale.claim), (Job.QUEUED, ''))
+        self.assertEqual(fresh.status, Job.RUNNING)
+
+        # The dead worker's late result doesn't overwrite the new claim
+        [again] = queue.claim(now=now)
+        self.assertEqual((again.pk, again.attempts), (stale.pk, 2))
+        stale.claim = dead_claim
+        queue.run(stale)
+        again.refresh_from_db()
+        self.assertEqual(again.status, Job.RUNNING)
+
+    def test_stale_job_out_of_attempts_is_dead(self):
+        job = queue.enqueue('jobs.tests.fail')
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, attempts=3, claim='x', claimed_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(queue.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.claim), (Job.DEAD, ''))
+        self.assertEqual(job.last_error, 'Worker died while running the job')
@@ -1,22 +1,145 @@
 # orders/admin.py
-from django.contrib import admin
-from .models import Order, OrderItem
+from django import forms
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.http import urlencode
+from django.utils import timezone
+from . import export
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedOrderStatusEvent,
+    Order, OrderItem, OrderStatusEvent,
+)
+from .transitions import STATUS_FLOW, CANCELLED, can_transition, transition
+
+class OrderAdminForm(forms.ModelForm):
+    class Meta:
+        model = Order
+        fields = '__all__'
+
+    def clean_status(self):
+        status = self.cleaned_data['status']
+        current = self.instance.status if self.instance.pk else None
+        if current and status != current and not can_transition(current, status):
+            raise forms.ValidationError(
+                f'An order cannot go from {self.instance.get_status_display().lower()} to {status}.'
+            )
+        return status
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     raw_id_fields = ['product']
     extra = 0
 
+class OrderStatusEventInline(admin.TabularInline):
+    model = OrderStatusEvent
+    fields = ['created_at', 'from_status', 'to_status', 'actor']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+def _transition_action(status):
+    label = dict(Order.STATUS_CHOICES)[status]
+
+    @admin.action(description=f'Mark selected orders as {label.lower()}')
+    def action(modeladmin, request, queryset):
+        moved, skipped = transition(queryset, status, actor=request.user)
+        modeladmin.message_user(request, f'{moved} orders marked as {label.lower()}.')
+        if skipped:
+            modeladmin.message_user(
+                request,
+                f'{skipped} orders skipped: they cannot move to {label.lower()} from their current status.',
+                messages.WARNING,
+            )
+
+    action.__name__ = f'mark_{status}'
+    return action
+
+def _export_action(fmt):
+    @admin.action(description=f'Export selected orders with their items ({fmt.upper()})')
+    def action(modeladmin, request, queryset):
+        # "Select all" hands over the filtered changelist queryset unevaluated;
+        # it is streamed, never loaded at once.
+        response = StreamingHttpResponse(
+            export.render(export.iter_rows(queryset), fmt),
+            content_type=export.CONTENT_TYPES[fmt],
+        )
+        filename = f'orders-{timezone.now():%Y%m%d-%H%M%S}.{fmt}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    action.__name__ = f'export_{fmt}'
+    return action
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
+    form = OrderAdminForm
     # Use 'order_id' not 'order_number'
     list_display = ['order_id', 'name', 'email', 'total_amount', 'status', 'created_at']
     list_filter = ['status', 'created_at', 'payment_method']
     search_fields = ['order_id', 'name', 'email', 'phone']
-    inlines = [OrderItemInline]
+    inlines = [OrderItemInline, OrderStatusEventInline]
     readonly_fields = ['created_at', 'updated_at']
+    actions = [_transition_action(status) for status in STATUS_FLOW[1:] + [CANCELLED]] + [
+        _export_action(fmt) for fmt in export.FORMATS
+    ]
+
+    def save_model(self, request, obj, form, change):
+        # Recorded on the OrderStatusEvent if the status changed
+        obj._status_actor = request.user
+        super().save_model(request, obj, form, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            archive_admin = self.admin_site._registry[ArchivedOrder]
+            archived, _ = archive_admin.get_search_results(request, ArchivedOrder.objects.all(), search_term)
+            count = archived.count()
+            if count:
+                url = reverse('admin:orders_archivedorder_changelist')
+                self.message_user(request, format_html(
+                    '{} archived orders also match: <a href="{}?{}">see the archive</a>.',
+                    count, url, urlencode({'q': search_term}),
+                ), messages.INFO)
+        return queryset, may_have_duplicates
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    fields = ['product', 'quantity', 'price']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+class ArchivedOrderStatusEventInline(admin.TabularInline):
+    model = ArchivedOrderStatusEvent
+    fields = ['created_at', 'from_status', 'to_status', 'actor']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Finished orders moved out of the hot table by orders.archive; read-only"""
+    list_display = ['order_id', 'name', 'email', 'total_amount', 'status', 'created_at', 'archived_at']
+    list_filter = ['status', 'created_at', 'payment_method']
+    search_fields = ['order_id', 'name', 'email', 'phone']
+    inlines = [ArchivedOrderItemInline, ArchivedOrderStatusEventInline]
+    actions = [_export_action(fmt) for fmt in export.FORMATS]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ['order', 'product', 'quantity', 'price']
-    list_filter = ['order__status']
\ No newline at end of file
+    list_filter = ['order__status']
@@ -0,0 +1,137 @@
+# orders/archive.py
+"""
+Hot/archive split for orders.
+
+Delivered and cancelled orders whose last change is older than
+ORDER_ARCHIVE_AFTER are moved, in batches of one transaction each, from
+Order/OrderItem/OrderStatusEvent to the Archived* tables, keeping their
+id and order_id. The hot tables (and their indexes) then only hold
+orders that can still change plus recent history.
+
+get_order() and history_page() give the views one view of both.
+"""
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.utils import timezone
+
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedOrderStatusEvent,
+    Order, OrderItem, OrderStatusEvent,
+)
+
+FINISHED_STATUSES = ['delivered', 'cancelled']
+
+ORDER_FIELDS = [f.attname for f in ArchivedOrder._meta.concrete_fields if f.name != 'archived_at']
+ITEM_FIELDS = ['order_id', 'product_id', 'quantity', 'price']
+EVENT_FIELDS = ['order_id', 'from_status', 'to_status', 'actor_id', 'created_at']
+
+_archiving = ContextVar('orders_archiving', default=False)
+
+
+def is_archiving():
+    """True while archived orders are being deleted from the hot tables"""
+    return _archiving.get()
+
+
+def get_archive_age():
+    return getattr(settings, 'ORDER_ARCHIVE_AFTER', timedelta(days=90))
+
+
+def archivable(cutoff):
+    return Order.objects.filter(status__in=FINISHED_STATUSES, updated_at__lt=cutoff)
+
+
+def archive_batch(cutoff, batch_size=1000):
+    """Move one batch of finished orders to the archive; returns how many"""
+    with transaction.atomic():
+        ids = list(
+            archivable(cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by('updated_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(**row) for row in Order.objects.filter(pk__in=ids).values(*ORDER_FIELDS)
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(**row)
+            for row in OrderItem.objects.filter(order_id__in=ids).order_by('pk').values(*ITEM_FIELDS)
+        ])
+        ArchivedOrderStatusEvent.objects.bulk_create([
+            ArchivedOrderStatusEvent(**row)
+            for row in OrderStatusEvent.objects.filter(order_id__in=ids).order_by('pk').values(*EVENT_FIELDS)
+        ])
+
+        # The orders still count for the customer's stats
+        token = _archiving.set(True)
+        try:
+            Order.objects.filter(pk__in=ids).delete()
+        finally:
+            _archiving.reset(token)
+    return len(ids)
+
+
+def archive(batch_size=1000, older_than=None):
+    """Archive every finished order older than older_than (default ORDER_ARCHIVE_AFTER)"""
+    cutoff = timezone.now() - (older_than or get_archive_age())
+    total = 0
+    while count := archive_batch(cutoff, batch_size):
+        total += count
+    return total
+
+
+def get_order(**lookup):
+    """The order matching lookup, hot or archived, or None"""
+    return Order.objects.filter(**lookup).first() or ArchivedOrder.objects.filter(**lookup).first()
+
+
+def _with_items(orders, item_model):
+    return orders.annotate(item_count=Count('items')).prefetch_related(
+        Prefetch('items', queryset=item_model.objects.select_related('product'))
+    )
+
+
+def history_page(user, number, per_page, count=None):
+    """
+    One page of the user's orders, hot and archived, newest first, with
+    item_count annotated and items prefetched.
+
+    count (e.g. the stats row's order_count) spares the COUNT(*) over both
+    tables. It is only trusted while the page agrees with it: a count that
+    has drifted, or one read from a lagging replica, falls back to counting
+    rather than cutting the history short or ending it with empty pages.
+    """
+    keys = (
+        Order.objects.filter(user=user).order_by().values_list('created_at', 'id')
+        .union(ArchivedOrder.objects.filter(user=user).order_by().values_list('created_at', 'id'), all=True)
+        .order_by('-created_at', '-id')
+    )
+    paginator = Paginator(keys, per_page)
+    if count is not None:
+        paginator.count = count
+    page = paginator.get_page(number)
+    # One row past the page tells whether there is more than count says
+    offset = (page.number - 1) * per_page
+    rows = list(keys[offset:offset + per_page + 1])
+    expected = min(per_page, max(paginator.count - offset, 0))
+    if count is not None and (len(rows[:per_page]) != expected or (len(rows) > per_page and not page.has_next())):
+        paginator = Paginator(keys, per_page)
+        page = paginator.get_page(number)
+        offset = (page.number - 1) * per_page
+        rows = list(keys[offset:offset + per_page])
+
+    ids = [pk for _, pk in rows[:per_page]]
+    found = {order.pk: order for order in _with_items(Order.objects.filter(pk__in=ids), OrderItem)}
+    missing = [pk for pk in ids if pk not in found]
+    if missing:
+        found.update((order.pk, order) for order in _with_items(ArchivedOrder.objects.filter(pk__in=missing), ArchivedOrderItem))
+    page.object_list = [found[pk] for pk in ids if pk in found]
+    return page
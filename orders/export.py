@@ -0,0 +1,109 @@
+# orders/export.py
+"""
+Streaming order export: one row per order line, CSV or JSONL.
+
+Orders are read with .iterator(chunk_size) and their items prefetched per
+chunk, so memory stays flat however many orders there are. Rows come out
+in (created_at, id) order; an interrupted export is resumed by passing the
+last exported created_at as `since` (orders at exactly that instant are
+repeated, dedupe them on order_id + product_id).
+"""
+import csv
+import heapq
+import json
+
+from django.db.models import Prefetch
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+FORMATS = ('csv', 'jsonl')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+ITEM_MODELS = {Order: OrderItem, ArchivedOrder: ArchivedOrderItem}
+
+FIELDS = [
+    'order_id', 'created_at', 'status', 'payment_method', 'total_amount',
+    'name', 'email', 'phone', 'address', 'city', 'state', 'pincode',
+    'product_id', 'product_name', 'quantity', 'price', 'line_total',
+]
+
+
+def filter_orders(orders, status=None, payment_method=None, since=None, until=None):
+    """The OrderAdmin list_filter options, plus a [since, until) created_at range"""
+    if status:
+        orders = orders.filter(status=status)
+    if payment_method:
+        orders = orders.filter(payment_method=payment_method)
+    if since:
+        orders = orders.filter(created_at__gte=since)
+    if until:
+        orders = orders.filter(created_at__lt=until)
+    return orders
+
+
+def iter_rows(orders, chunk_size=2000):
+    """Yield one dict per order line (an order without lines gets one row)"""
+    orders = (
+        orders.order_by('created_at', 'pk')
+        .prefetch_related(Prefetch('items', queryset=ITEM_MODELS[orders.model].objects.select_related('product').order_by('pk')))
+        .iterator(chunk_size=chunk_size)
+    )
+    for order in orders:
+        base = {
+            'order_id': order.order_id,
+            'created_at': order.created_at.isoformat(),
+            'status': order.status,
+            'payment_method': order.payment_method,
+            'total_amount': str(order.total_amount),
+            'name': order.name,
+            'email': order.email or '',
+            'phone': order.phone,
+            'address': order.address,
+            'city': order.city,
+            'state': order.state,
+            'pincode': order.pincode,
+        }
+        items = order.items.all()
+        if not items:
+            yield {**base, 'product_id': '', 'product_name': '', 'quantity': '', 'price': '', 'line_total': ''}
+        for item in items:
+            yield {
+                **base,
+                'product_id': item.product_id,
+                'product_name': item.product.name,
+                'quantity': item.quantity,
+                'price': str(item.price),
+                'line_total': str(item.get_cost()),
+            }
+
+
+def iter_all_rows(chunk_size=2000, **filters):
+    """iter_rows over hot and archived orders, merged in created_at order"""
+    return heapq.merge(
+        iter_rows(filter_orders(Order.objects.all(), **filters), chunk_size),
+        iter_rows(filter_orders(ArchivedOrder.objects.all(), **filters), chunk_size),
+        key=lambda row: row['created_at'],
+    )
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def render(rows, fmt):
+    """Yield the export as text chunks, one per row"""
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+        return
+    writer = csv.DictWriter(_Echo(), fieldnames=FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,120 @@
+# orders/idempotency.py
+"""
+Idempotency keys for checkout.
+
+The checkout form carries a random key. The first POST with it inserts an
+IdempotencyKey row; the unique (owner, key) constraint means exactly one
+of several concurrent identical submissions wins, without locking
+anything other checkouts touch. The winner places the order and links it
+to the key in the same transaction. Repeats find that order and get the
+original redirect to orders:success.
+
+A claim whose request died before placing an order can be taken over
+once it is CHECKOUT_CLAIM_TIMEOUT old.
+"""
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+MAX_KEY_LENGTH = 64
+
+
+def new_key():
+    return uuid.uuid4().hex
+
+
+def get_owner(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if request.session.session_key is None:
+        request.session.save()
+    return f'session:{request.session.session_key}'
+
+
+def get_ttl():
+    return getattr(settings, 'CHECKOUT_IDEMPOTENCY_TTL', timedelta(hours=24))
+
+
+def get_claim_timeout():
+    return getattr(settings, 'CHECKOUT_CLAIM_TIMEOUT', timedelta(seconds=30))
+
+
+@dataclass(frozen=True)
+class Claim:
+    """claimed: this request should place the order; order: already placed"""
+    record: IdempotencyKey = None
+    claimed: bool = False
+    order: object = None
+
+
+def claim(owner, key, wait=5.0, poll=0.1):
+    """
+    Claim key for owner. If another request holds it, wait up to `wait`
+    seconds for that request to finish and return its order.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(
+                owner=owner, key=key[:MAX_KEY_LENGTH], claimed_at=now, expires_at=now + get_ttl(),
+            )
+        return Claim(record=record, claimed=True)
+    except IntegrityError:
+        pass
+
+    deadline = time.monotonic() + wait
+    while True:
+        record = (
+            IdempotencyKey.objects.select_related('order')
+            .filter(owner=owner, key=key[:MAX_KEY_LENGTH])
+            .first()
+        )
+        if record is None:
+            # The other request failed and gave the key back
+            return claim(owner, key, wait=max(deadline - time.monotonic(), 0), poll=poll)
+        if record.order is not None:
+            return Claim(record=record, order=record.order)
+
+        stale = timezone.now() - get_claim_timeout()
+        if record.claimed_at < stale:
+            taken = IdempotencyKey.objects.filter(
+                pk=record.pk, order__isnull=True, claimed_at=record.claimed_at,
+            ).update(claimed_at=timezone.now())
+            if taken:
+                return Claim(record=record, claimed=True)
+
+        if time.monotonic() >= deadline:
+            return Claim(record=record)
+        time.sleep(poll)
+
+
+def complete(record, order):
+    """Link the placed order to the key; call inside the order's transaction"""
+    IdempotencyKey.objects.filter(pk=record.pk).update(order=order)
+
+
+def release(record):
+    """Placing the order failed: let a retry with the same key try again"""
+    IdempotencyKey.objects.filter(pk=record.pk, order__isnull=True).delete()
+
+
+def prune(batch_size=1000, now=None):
+    """Delete expired keys in batches; returns how many were deleted"""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        pks = list(
+            IdempotencyKey.objects.filter(expires_at__lt=now)
+            .order_by('expires_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return total
+        total += IdempotencyKey.objects.filter(pk__in=pks).delete()[0]
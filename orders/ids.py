@@ -0,0 +1,194 @@
+# orders/ids.py
+"""
+Order number generation.
+
+The default generator makes time-ordered 64-bit ids, snowflake style:
+
+    40 bits  milliseconds since ORDER_ID_EPOCH  (~34 years)
+    16 bits  node id
+     8 bits  per-millisecond sequence           (256 ids/ms per node)
+
+rendered as 13 Crockford base32 characters after an "ORD" prefix, e.g.
+ORD01J9ZK3TQ8W0Z. Crockford base32 has no I, L, O or U, so an id read out
+over the phone can't be mistaken for another one.
+
+Ids are unique without any database round trip as long as no two live
+processes share a node id. A node id is ORDER_ID_HOST (0-255, different
+on every host) followed by a slot (0-255) that the process leases on its
+host by locking a file in ORDER_ID_LOCK_DIR. The lock is held for as
+long as the process lives, and forked workers lease their own slot. So
+the workers of one host can't share a node. Process ids can't be used
+instead: they go well past 16 bits, and truncating them can collide.
+ORDER_ID_NODE (0-65535) pins the whole node id instead, for platforms
+without file locks; then it must differ for every process.
+
+Set ORDER_ID_GENERATOR to the dotted path of another callable to replace
+the scheme entirely.
+"""
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+PREFIX = 'ORD'
+WIDTH = 13
+
+TIMESTAMP_BITS = 40
+NODE_BITS = 16
+SEQUENCE_BITS = 8
+
+MAX_NODE = (1 << NODE_BITS) - 1
+# Node id = host (high 8 bits) + slot leased on that host (low 8 bits)
+SLOT_BITS = 8
+MAX_HOST = (1 << (NODE_BITS - SLOT_BITS)) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+DEFAULT_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# Characters people tend to read/type instead of the Crockford ones
+_CONFUSABLE = str.maketrans({'I': '1', 'L': '1', 'O': '0'})
+
+
+def encode(number, width=WIDTH):
+    chars = []
+    while number:
+        number, remainder = divmod(number, 32)
+        chars.append(ALPHABET[remainder])
+    return ''.join(reversed(chars)).rjust(width, '0')
+
+
+def decode(text):
+    number = 0
+    for char in text.upper().translate(_CONFUSABLE):
+        number = number * 32 + ALPHABET.index(char)
+    return number
+
+
+def normalize_order_id(order_id):
+    """Canonical form of a typed-in order id ('ord-01j9 zk3t...' -> 'ORD01J9ZK3T...')"""
+    order_id = order_id.strip().upper().replace('-', '').replace(' ', '')
+    if not order_id.startswith(PREFIX):
+        return order_id
+    body = order_id[len(PREFIX):]
+    # Legacy ORD{YYYYMMDD}{NNNN} ids are all digits and stay as they are
+    if body.isdigit():
+        return order_id
+    return PREFIX + body.translate(_CONFUSABLE)
+
+
+def _lease_slot():
+    """
+    Lock the lowest free slot file on this host. Returns (slot, fd); the
+    lock goes away with the fd, i.e. at the latest when the process dies.
+    """
+    directory = Path(
+        getattr(settings, 'ORDER_ID_LOCK_DIR', None)
+        or Path(tempfile.gettempdir()) / 'gulshop-order-ids'
+    )
+    directory.mkdir(parents=True, exist_ok=True)
+    for slot in range(1 << SLOT_BITS):
+        fd = os.open(directory / f'{slot}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        return slot, fd
+    raise ImproperlyConfigured(f'All {1 << SLOT_BITS} order id slots in {directory} are taken')
+
+
+def _check_range(name, value, maximum):
+    value = int(value)
+    if not 0 <= value <= maximum:
+        raise ImproperlyConfigured(f'{name} must be between 0 and {maximum}, got {value}')
+    return value
+
+
+class TimeOrderedIdGenerator:
+    """Thread-safe and fork-aware; ids from one node are strictly increasing"""
+
+    def __init__(self, node=None, epoch=None):
+        self._configured_node = node
+        self._epoch_ms = int((epoch or DEFAULT_EPOCH).timestamp() * 1000)
+        self._lock = threading.Lock()
+        self._slot_fd = None
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        if self._slot_fd is not None:
+            # A forked child's copy of the parent's lease: closing it leaves
+            # the parent's lock in place
+            os.close(self._slot_fd)
+            self._slot_fd = None
+        # Leased on first use, so forked processes that never make ids
+        # don't take a slot
+        self.node = None
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _get_node(self):
+        node = self._configured_node
+        if node is None:
+            node = getattr(settings, 'ORDER_ID_NODE', None)
+        if node is not None:
+            return _check_range('ORDER_ID_NODE', node, MAX_NODE)
+        if fcntl is None:
+            raise ImproperlyConfigured('Set ORDER_ID_NODE: this platform has no file locks to lease a node id with')
+        host = _check_range('ORDER_ID_HOST', getattr(settings, 'ORDER_ID_HOST', 0), MAX_HOST)
+        slot, self._slot_fd = _lease_slot()
+        return (host << SLOT_BITS) | slot
+
+    def next_int(self):
+        with self._lock:
+            if self.node is None:
+                self.node = self._get_node()
+            now = int(time.time() * 1000) - self._epoch_ms
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # Same millisecond, or the clock went backwards: keep counting
+                # from the last timestamp so ids never decrease.
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    # Borrow the next millisecond instead of sleeping
+                    self._last_ms += 1
+                    self._sequence = 0
+            return (
+                (self._last_ms << (NODE_BITS + SEQUENCE_BITS))
+                | (self.node << SEQUENCE_BITS)
+                | self._sequence
+            )
+
+    def __call__(self):
+        return PREFIX + encode(self.next_int())
+
+
+_generator = None
+
+
+def get_generator():
+    global _generator
+    if _generator is None:
+        path = getattr(settings, 'ORDER_ID_GENERATOR', None)
+        _generator = import_string(path)() if path else TimeOrderedIdGenerator()
+    return _generator
+
+
+def new_order_id():
+    """Default for Order.order_id"""
+    return get_generator()()
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders import archive
+
+
+class Command(BaseCommand):
+    help = 'Move delivered and cancelled orders older than ORDER_ARCHIVE_AFTER to the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive orders finished more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days']) if options['days'] is not None else archive.get_archive_age()
+        if options['dry_run']:
+            count = archive.archivable(timezone.now() - older_than).count()
+            self.stdout.write(f'{count} orders would be archived')
+            return
+        count = archive.archive(batch_size=options['batch_size'], older_than=older_than)
+        self.stdout.write(self.style.SUCCESS(f'Archived {count} orders'))
@@ -0,0 +1,65 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from orders import export
+from orders.models import Order
+
+
+def _parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Not a date or datetime: {value}')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = 'Stream orders (hot and archived) with their items as CSV or JSONL (constant memory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help='File to write (default: stdout)')
+        parser.add_argument('--format', choices=export.FORMATS, help='Default: from the file extension, else csv')
+        parser.add_argument('--status', choices=[status for status, _ in Order.STATUS_CHOICES])
+        parser.add_argument('--payment-method', choices=[method for method, _ in Order.PAYMENT_METHODS])
+        parser.add_argument('--since', help='Orders created at or after this date/datetime (resume point)')
+        parser.add_argument('--until', help='Orders created before this date/datetime')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        fmt = options['format'] or ('jsonl' if output.endswith(('.jsonl', '.ndjson')) else 'csv')
+        filters = dict(
+            status=options['status'],
+            payment_method=options['payment_method'],
+            since=options['since'] and _parse_moment(options['since']),
+            until=options['until'] and _parse_moment(options['until']),
+        )
+
+        progress = {'count': 0, 'last': None}
+
+        def rows():
+            # Archived orders included, merged in created_at order
+            for row in export.iter_all_rows(options['chunk_size'], **filters):
+                progress['count'] += 1
+                progress['last'] = row['created_at']
+                yield row
+
+        handle = self.stdout if output == '-' else open(output, 'w', newline='', encoding='utf-8')
+        try:
+            for chunk in export.render(rows(), fmt):
+                handle.write(chunk)
+        finally:
+            if output != '-':
+                handle.close()
+            self.stderr.write(f"Exported {progress['count']} order lines")
+            if progress['last']:
+                self.stderr.write(
+                    f"Last created_at: {progress['last']} (pass it as --since to resume after an interruption)"
+                )
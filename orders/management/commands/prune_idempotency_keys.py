@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.idempotency import prune
+
+
+class Command(BaseCommand):
+    help = 'Delete expired checkout idempotency keys (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = prune(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired idempotency keys'))
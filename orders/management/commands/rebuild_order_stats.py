@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute CustomerOrderStats from Order in batches and report rows that had drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users per batch')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report drift, do not fix it; exits non-zero if any was found',
+        )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for user_id, stored, computed in rebuild(options['batch_size'], fix=not options['check']):
+            drifted += 1
+            if options['verbosity'] > 1:
+                if stored is None:
+                    self.stdout.write(f'user {user_id}: missing, should be {computed}')
+                else:
+                    diff = {
+                        field: (stored[field], value)
+                        for field, value in computed.items() if stored[field] != value
+                    }
+                    self.stdout.write(f'user {user_id}: {diff}')
+
+        if options['check'] and drifted:
+            raise CommandError(f'{drifted} customers have drifted stats')
+        verb = 'found' if options['check'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'{drifted} drifted customers {verb}'))
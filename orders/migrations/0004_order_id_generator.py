@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:09
+
+import orders.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_alter_order_options_rename_created_order_created_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='order_id',
+            field=models.CharField(default=orders.ids.new_order_id, max_length=20, unique=True),
+        ),
+    ]
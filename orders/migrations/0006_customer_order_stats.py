@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    CustomerOrderStats = apps.get_model('orders', 'CustomerOrderStats')
+    stats = {}
+    rows = (
+        Order.objects.filter(user__isnull=False)
+        .order_by()
+        .values_list('user_id', 'status')
+        .annotate(count=Count('id'), total=Sum('total_amount'))
+    )
+    for user_id, status, count, total in rows:
+        row = stats.setdefault(user_id, CustomerOrderStats(user_id=user_id))
+        row.order_count += count
+        setattr(row, f'{status}_count', getattr(row, f'{status}_count') + count)
+        if status != 'cancelled':
+            row.total_spent += total
+    CustomerOrderStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('orders', '0005_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerOrderStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('confirmed_count', models.PositiveIntegerField(default=0)),
+                ('processing_count', models.PositiveIntegerField(default=0)),
+                ('shipped_count', models.PositiveIntegerField(default=0)),
+                ('delivered_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'customer order stats',
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -2,8 +2,11 @@
 from django.db import models
 from django.conf import settings  # Import settings
 from products.models import Product
+from .ids import new_order_id
 
 class Order(models.Model):
+    is_archived = False
+
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
@@ -19,7 +22,8 @@ class Order(models.Model):
     ]
     
     # FIX: Use settings.AUTH_USER_MODEL
-    order_id = models.CharField(max_length=20, unique=True)
+    # Time-ordered and collision-free, see orders.ids
+    order_id = models.CharField(max_length=20, unique=True, default=new_order_id)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
    
     
@@ -46,6 +50,16 @@ class Order(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A customer's order history, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            # Finished orders waiting to be archived (orders.archive)
+            models.Index(
+                fields=['updated_at'],
+                condition=models.Q(status__in=['delivered', 'cancelled']),
+                name='order_finished_idx',
+            ),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
@@ -57,4 +71,142 @@ class OrderItem(models.Model):
         return f"{self.product.name} x {self.quantity}"
     
     def get_cost(self):
-        return self.price * self.quantity
\ No newline at end of file
+        return self.price * self.quantity
+
+
+class OrderStatusEvent(models.Model):
+    """One status change of an order; track_order shows them as a timeline"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['order', 'created_at'], name='status_event_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id}: {self.from_status} -> {self.to_status}"
+
+class CustomerOrderStats(models.Model):
+    """
+    Lifetime order figures per customer, kept up to date by orders.stats
+    so profile and history pages never scan Order.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='order_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    # Cancelled orders don't count towards money spent
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    pending_count = models.PositiveIntegerField(default=0)
+    confirmed_count = models.PositiveIntegerField(default=0)
+    processing_count = models.PositiveIntegerField(default=0)
+    shipped_count = models.PositiveIntegerField(default=0)
+    delivered_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'customer order stats'
+
+    def __str__(self):
+        return f"{self.user}: {self.order_count} orders"
+
+    def status_counts(self):
+        """{status: count} for every status plus 'total'"""
+        counts = {status: getattr(self, f'{status}_count') for status, _ in Order.STATUS_CHOICES}
+        counts['total'] = self.order_count
+        return counts
+
+
+class IdempotencyKey(models.Model):
+    """
+    One checkout form submission. The first request with a key claims the
+    row; repeats of it (double clicks, retries) find the order it placed
+    instead of placing another. See orders.idempotency.
+    """
+    # 'user:<pk>' or 'session:<session key>'
+    owner = models.CharField(max_length=64)
+    key = models.CharField(max_length=64)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    claimed_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'key'], name='idempotency_owner_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner}/{self.key}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    A delivered or cancelled order moved out of the hot Order table by
+    orders.archive. Same fields, same id and order_id as it had there.
+    """
+    is_archived = True
+
+    id = models.BigIntegerField(primary_key=True)
+    order_id = models.CharField(max_length=20, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_orders')
+
+    name = models.CharField(max_length=100)
+    email = models.EmailField(blank=True, null=True)
+    phone = models.CharField(max_length=15)
+    address = models.TextField()
+    city = models.CharField(max_length=50, blank=True)
+    state = models.CharField(max_length=50, blank=True)
+    pincode = models.CharField(max_length=10, blank=True)
+
+    payment_method = models.CharField(max_length=10, choices=Order.PAYMENT_METHODS, default='cod')
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Order #{self.order_id} (archived)"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='archived_order_user_idx'),
+        ]
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity}"
+
+    def get_cost(self):
+        return self.price * self.quantity
+
+
+class ArchivedOrderStatusEvent(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='status_events')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['created_at', 'id']
+
+    def __str__(self):
+        return f"{self.order_id}: {self.from_status} -> {self.to_status}"
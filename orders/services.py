@@ -0,0 +1,104 @@
+# orders/services.py
+import logging
+from dataclasses import dataclass
+
+from django.db import DatabaseError, transaction
+
+from inventory.services import OutOfStock, reserve
+from jobs.queue import enqueue
+from products.models import Product
+from . import idempotency
+from .models import Order, OrderItem
+
+# Order fields taken from the checkout form
+CUSTOMER_FIELDS = ['name', 'email', 'phone', 'address', 'city', 'state', 'pincode']
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OrderResult:
+    """Outcome of place_order, shared by the checkout view and any API"""
+    order: Order = None
+    errors: tuple = ()
+
+    @property
+    def ok(self):
+        return self.order is not None
+
+
+def _product_name(snapshot, product_id):
+    for line in snapshot:
+        if line.product.pk == product_id:
+            return line.product.name
+    return 'A product'
+
+
+def place_order(cart, customer, user=None, idempotency_key=None):
+    """
+    Turn a cart.cart.Cart into an Order in one transaction.
+
+    The cart's products are read and priced once; the order total and
+    every item (one bulk insert) use that price snapshot, so a concurrent
+    price edit can't make them disagree. Product rows aren't locked: stock
+    is reserved in the same transaction by a conditional update (see
+    inventory.services), so a sold-out product fails the whole order.
+    Nothing is saved unless everything is.
+    idempotency_key, an orders.idempotency claim, is linked to the order
+    in the same transaction.
+    The caller clears the cart on success.
+    """
+    quantities, _ = cart.quantities()
+    if not quantities:
+        return OrderResult(errors=('Your cart is empty!',))
+
+    try:
+        with transaction.atomic():
+            products = (
+                Product.objects.select_related('category')
+                .order_by('pk')
+                .in_bulk(list(quantities))
+            )
+            snapshot = cart.snapshot(products=products)
+
+            unavailable = [line.product.name for line in snapshot if not line.product.available]
+            if unavailable:
+                return OrderResult(errors=tuple(
+                    f'{name} is no longer available. Please remove it from your cart.'
+                    for name in unavailable
+                ))
+            if not snapshot.lines:
+                return OrderResult(errors=('None of the products in your cart exist anymore.',))
+
+            fields = {field: customer[field] for field in CUSTOMER_FIELDS if field in customer}
+            order = Order.objects.create(
+                user=user if user is not None and user.is_authenticated else None,
+                total_amount=snapshot.total_price,
+                status='pending',
+                **fields,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=line.product,
+                    quantity=line.quantity,
+                    price=line.product.price,
+                )
+                for line in snapshot
+            ])
+            reserve({line.product.pk: line.quantity for line in snapshot}, order=order)
+            if idempotency_key is not None:
+                idempotency.complete(idempotency_key, order)
+            # Follow-up work runs in jobs workers, never in the request
+            enqueue('orders.send_confirmation', order_id=order.pk)
+    except OutOfStock as e:
+        name = _product_name(snapshot, e.product_id)
+        if e.available:
+            return OrderResult(errors=(f'Only {e.available} left of {name}. Please update your cart.',))
+        return OrderResult(errors=(f'{name} is out of stock. Please remove it from your cart.',))
+    except DatabaseError:
+        # Details go to the log, not to the customer
+        logger.exception('Could not place order')
+        return OrderResult(errors=('We could not place your order. Please try again.',))
+
+    return OrderResult(order=order)
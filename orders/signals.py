@@ -0,0 +1,63 @@
+# orders/signals.py
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import archive, stats
+from .models import Order, OrderStatusEvent
+from .transitions import status_changed
+
+
+TRACKED_FIELDS = {'user_id', 'status', 'total_amount'}
+
+# Loaded without one of the tracked fields: the old state is unknown
+UNKNOWN = object()
+
+
+def _state(order):
+    return order.user_id, order.status, order.total_amount
+
+
+@receiver(post_init, sender=Order)
+def remember_state(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._stats_state = None
+    elif TRACKED_FIELDS & instance.get_deferred_fields():
+        instance._stats_state = UNKNOWN
+    else:
+        instance._stats_state = _state(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = instance._stats_state
+    user_id, status, total = new = _state(instance)
+    if old is UNKNOWN:
+        stats.refresh(user_id)
+    elif old is None or old[0] == user_id:
+        stats.record_change(user_id, old and old[1:], (status, total))
+    else:
+        stats.record_change(old[0], old=old[1:])
+        stats.record_change(user_id, new=(status, total))
+    instance._stats_state = new
+
+    if old is UNKNOWN:
+        # Can't tell whether the status changed; the receivers are idempotent
+        status_changed.send(sender=Order, order_ids=[instance.pk], status=status)
+    elif old is not None and old[1] != status:
+        OrderStatusEvent.objects.create(
+            order=instance, from_status=old[1], to_status=status,
+            actor=getattr(instance, '_status_actor', None), created_at=timezone.now(),
+        )
+        status_changed.send(sender=Order, order_ids=[instance.pk], status=status)
+
+
+@receiver(post_delete, sender=Order)
+def remove_from_stats(sender, instance, **kwargs):
+    if archive.is_archiving():
+        # Moved to ArchivedOrder, still one of the customer's orders
+        return
+    user_id, status, total = _state(instance)
+    stats.record_change(user_id, old=(status, total))
@@ -0,0 +1,146 @@
+# orders/stats.py
+"""
+Incremental maintenance of CustomerOrderStats.
+
+Every Order save/delete turns into one UPDATE of the customer's stats row
+with F() deltas, in the same transaction as the order itself. A missing
+row is rebuilt from Order on the spot. Code that changes orders with
+QuerySet.update() skips the signals and must call record_changes() itself;
+rebuild() (the rebuild_order_stats command) recomputes everything and
+reports drift.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import ArchivedOrder, CustomerOrderStats, Order
+
+COUNTED_FIELDS = ['order_count', 'total_spent'] + [f'{status}_count' for status, _ in Order.STATUS_CHOICES]
+
+
+def _contribution(status, total, sign):
+    deltas = {'order_count': sign, f'{status}_count': sign}
+    if status != 'cancelled':
+        deltas['total_spent'] = sign * (total or Decimal('0'))
+    return deltas
+
+
+def record_change(user_id, old=None, new=None):
+    """
+    Apply one order's change to its customer's stats.
+    old/new are (status, total_amount) before and after; None for a
+    created or deleted order.
+    """
+    record_changes([(user_id, old, new)])
+
+
+def record_changes(changes):
+    """record_change for many (user_id, old, new) at once, one UPDATE per customer"""
+    per_user = {}
+    for user_id, old, new in changes:
+        if user_id is None:
+            continue
+        deltas = per_user.setdefault(user_id, {})
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            for field, delta in _contribution(*state, sign).items():
+                deltas[field] = deltas.get(field, 0) + delta
+
+    now = timezone.now()
+    for user_id, deltas in per_user.items():
+        updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if not updates:
+            continue
+        if not CustomerOrderStats.objects.filter(user_id=user_id).update(updated_at=now, **updates):
+            # First order, or the row was lost: start from what's in Order now
+            refresh(user_id)
+
+
+def compute(user_ids):
+    """{user_id: {field: value}} straight from Order and ArchivedOrder, one GROUP BY query each"""
+    figures = {user_id: dict.fromkeys(COUNTED_FIELDS, 0) for user_id in user_ids}
+    rows = [
+        row
+        for model in (Order, ArchivedOrder)
+        for row in (
+            model.objects.filter(user_id__in=user_ids)
+            .order_by()
+            .values_list('user_id', 'status')
+            .annotate(count=Count('id'), total=Sum('total_amount'))
+        )
+    ]
+    for user_id, status, count, total in rows:
+        values = figures[user_id]
+        values['order_count'] += count
+        values[f'{status}_count'] += count
+        if status != 'cancelled':
+            values['total_spent'] += total
+    for values in figures.values():
+        values['total_spent'] = Decimal(values['total_spent']).quantize(Decimal('0.01'))
+    return figures
+
+
+def refresh(user_id):
+    if user_id is None:
+        return
+    values = compute([user_id])[user_id]
+    try:
+        with transaction.atomic():
+            CustomerOrderStats.objects.update_or_create(user_id=user_id, defaults=values)
+    except IntegrityError:
+        # Created concurrently; that writer counted from Order as well
+        CustomerOrderStats.objects.filter(user_id=user_id).update(**values)
+
+
+def get_stats(user):
+    """The user's stats row, or an all-zero one if they never ordered"""
+    try:
+        return user.order_stats
+    except CustomerOrderStats.DoesNotExist:
+        return CustomerOrderStats(user=user)
+
+
+def rebuild(batch_size=500, fix=True):
+    """
+    Recompute every customer's stats in batches of users.
+    Yields (user_id, stored, computed) for every row that had drifted
+    (stored is None for a missing row); rows are corrected when fix is set.
+    """
+    User = get_user_model()
+    last_pk = None
+    while True:
+        users = User.objects.order_by('pk')
+        if last_pk is not None:
+            users = users.filter(pk__gt=last_pk)
+        user_ids = list(users.values_list('pk', flat=True)[:batch_size])
+        if not user_ids:
+            return
+        last_pk = user_ids[-1]
+
+        figures = compute(user_ids)
+        stored = {
+            row['user_id']: row
+            for row in CustomerOrderStats.objects.filter(user_id__in=user_ids).values('user_id', *COUNTED_FIELDS)
+        }
+        missing, changed = [], []
+        for user_id in user_ids:
+            values = figures[user_id]
+            row = stored.get(user_id)
+            if row is None:
+                if not values['order_count']:
+                    continue
+                missing.append(CustomerOrderStats(user_id=user_id, **values))
+            elif any(row[field] != values[field] for field in COUNTED_FIELDS):
+                changed.append(CustomerOrderStats(user_id=user_id, updated_at=timezone.now(), **values))
+            else:
+                continue
+            yield user_id, row, values
+
+        if fix and (missing or changed):
+            with transaction.atomic():
+                CustomerOrderStats.objects.bulk_create(missing, ignore_conflicts=True)
+                CustomerOrderStats.objects.bulk_update(changed, COUNTED_FIELDS + ['updated_at'])
@@ -0,0 +1,30 @@
+# orders/tasks.py
+"""Follow-up work for placed orders, run by jobs workers (manage.py run_workers)"""
+from django.core.mail import send_mail
+from django.urls import reverse
+
+from jobs.queue import task
+from .models import Order
+
+
+@task('orders.send_confirmation')
+def send_confirmation(order_id):
+    order = Order.objects.prefetch_related('items__product').filter(pk=order_id).first()
+    if order is None or not order.email:
+        return
+    lines = [f"{item.product.name} x {item.quantity} - ₹{item.get_cost()}" for item in order.items.all()]
+    send_mail(
+        subject=f'Gul Shop order {order.order_id} received',
+        message='\n'.join([
+            f'Hi {order.name},',
+            '',
+            f'Thank you for your order {order.order_id}.',
+            '',
+            *lines,
+            f'Total: ₹{order.total_amount}',
+            '',
+            f"Track it at {reverse('orders:track', args=[order.order_id])}",
+        ]),
+        from_email=None,
+        recipient_list=[order.email],
+    )
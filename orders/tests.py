@@ -1,3 +1,541 @@
-from django.test import TestCase
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory.models import StockLevel
+from jobs.models import Job
+from products.models import Category, Product
+from . import archive, export, idempotency, stats
+from .ids import PREFIX, TimeOrderedIdGenerator, decode, get_generator, normalize_order_id
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, ArchivedOrderStatusEvent, CustomerOrderStats,
+    IdempotencyKey, Order, OrderItem, OrderStatusEvent,
+)
+from .transitions import allowed_sources, can_transition, transition
+
+
+def _generate(count):
+    # The process-wide generator, exactly as a web worker uses it
+    generator = get_generator()
+    return [decode(generator()[len(PREFIX):]) for _ in range(count)]
+
+
+class OrderIdTests(SimpleTestCase):
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        settings = override_settings(ORDER_ID_LOCK_DIR=lock_dir.name, ORDER_ID_NODE=None)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def assertUniqueAcrossProcesses(self, processes, per_process):
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            results = list(pool.map(_generate, [per_process] * processes))
+
+        for values in results:
+            self.assertTrue(all(a < b for a, b in zip(values, values[1:])))
+        self.assertEqual(len({value for values in results for value in values}), processes * per_process)
+
+    def test_unique_and_increasing_across_processes(self):
+        # An id repeats only if two processes share a node, or one node
+        # hands out a (millisecond, sequence) pair twice. The first is what
+        # this covers: 80k ids from four forked nodes. The second doesn't
+        # depend on volume and is forced below with a stopped and a
+        # backwards clock. ORDER_ID_STRESS=1 adds a run with millions of ids.
+        self.assertUniqueAcrossProcesses(4, 20_000)
+
+    def test_full_millisecond_and_backwards_clock(self):
+        generator = TimeOrderedIdGenerator(node=1)
+        now = time.time()
+        with mock.patch('orders.ids.time.time', return_value=now):
+            stopped = [generator.next_int() for _ in range(1000)]
+        with mock.patch('orders.ids.time.time', return_value=now - 5):
+            backwards = [generator.next_int() for _ in range(1000)]
+        values = stopped + backwards
+        self.assertTrue(all(a < b for a, b in zip(values, values[1:])))
+        # 256 per millisecond, then the next one is borrowed
+        milliseconds = [value >> 24 for value in values]
+        self.assertEqual(milliseconds[255], milliseconds[0])
+        self.assertEqual(milliseconds[256], milliseconds[0] + 1)
+        self.assertEqual(milliseconds[-1], milliseconds[0] + (len(values) - 1) // 256)
+
+    @skipUnless(os.environ.get('ORDER_ID_STRESS'), 'set ORDER_ID_STRESS=1 to generate millions of ids (slow)')
+    def test_millions_unique_across_processes(self):
+        self.assertUniqueAcrossProcesses(8, 250_000)
+
+    def test_processes_of_one_host_get_different_nodes(self):
+        first, second = TimeOrderedIdGenerator(), TimeOrderedIdGenerator()
+        first()
+        second()
+        self.assertNotEqual(first.node, second.node)
+
+    @override_settings(ORDER_ID_HOST=3)
+    def test_host_is_the_high_byte_of_the_node(self):
+        generator = TimeOrderedIdGenerator()
+        generator()
+        self.assertEqual(generator.node >> 8, 3)
+
+    def test_out_of_range_node_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            TimeOrderedIdGenerator(node=70000)()
+
+    def test_normalize_order_id(self):
+        self.assertEqual(normalize_order_id(' ord-0ij9 zk3l '), 'ORD01J9ZK31')
+        self.assertEqual(normalize_order_id('ORD202501010001'), 'ORD202501010001')
+
+
+class CheckoutIdempotencyTests(TestCase):
+    customer = {'name': 'A', 'phone': '1', 'address': 'X'}
+
+    def setUp(self):
+        category = Category.objects.create(name='Gul', slug='gul')
+        self.product = Product.objects.create(category=category, name='Gul', slug='gul', price=10)
+        StockLevel.objects.create(product=self.product, on_hand=5)
+        session = self.client.session
+        session['cart'] = {str(self.product.pk): 2}
+        session.save()
+
+    def checkout(self, key, **data):
+        return self.client.post(reverse('orders:create'), {**self.customer, **data, 'idempotency_key': key})
+
+    def test_replayed_checkout_places_one_order(self):
+        first = self.checkout('k1')
+        order = Order.objects.get()
+        self.assertRedirects(first, reverse('orders:success', args=[order.order_id]))
+        # The cart is already empty; the replay still gets the first redirect
+        second = self.checkout('k1')
+        self.assertRedirects(second, reverse('orders:success', args=[order.order_id]))
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(StockLevel.objects.get().reserved, 2)
+        self.assertEqual(Job.objects.filter(name='orders.send_confirmation').count(), 1)
+
+    def test_failed_checkout_gives_the_key_back(self):
+        self.checkout('k1', name='')
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.checkout('k1')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_database_errors_are_logged_not_shown(self):
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=DatabaseError('no such table: secret')), \
+                self.assertLogs('orders.services', 'ERROR'):
+            response = self.checkout('k1')
+        self.assertEqual(response.status_code, 200)
+        shown = [str(message) for message in response.context['messages']]
+        self.assertEqual(shown, ['We could not place your order. Please try again.'])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(StockLevel.objects.get().reserved, 0)
+
+    def test_claim_in_progress_is_not_taken_again(self):
+        self.assertTrue(idempotency.claim('session:a', 'k1').claimed)
+        attempt = idempotency.claim('session:a', 'k1', wait=0)
+        self.assertEqual((attempt.claimed, attempt.order), (False, None))
+        # Another owner may use the same key
+        self.assertTrue(idempotency.claim('session:b', 'k1').claimed)
+
+    def test_stale_claim_is_taken_over(self):
+        record = idempotency.claim('session:a', 'k1').record
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            claimed_at=record.claimed_at - idempotency.get_claim_timeout() - timedelta(seconds=1),
+        )
+        self.assertTrue(idempotency.claim('session:a', 'k1', wait=0).claimed)
+
+
+class TransitionTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='a', password='x')
+
+    def make_order(self, total, status='pending'):
+        return Order.objects.create(
+            user=self.user, name='A', phone='1', address='X', total_amount=total, status=status,
+        )
+
+    def assertStats(self, **expected):
+        row = CustomerOrderStats.objects.filter(user=self.user).values(*expected).get()
+        self.assertEqual(row, expected)
+        # The deltas add up to what a full recount gives
+        computed = stats.compute([self.user.pk])[self.user.pk]
+        self.assertEqual({field: computed[field] for field in expected}, expected)
+
+    def test_allowed_transitions(self):
+        self.assertTrue(can_transition('pending', 'confirmed'))
+        self.assertTrue(can_transition('pending', 'shipped'))
+        self.assertTrue(can_transition('shipped', 'cancelled'))
+        self.assertTrue(can_transition('processing', 'delivered'))
+
+    def test_rejected_transitions(self):
+        self.assertFalse(can_transition('shipped', 'confirmed'))
+        self.assertFalse(can_transition('confirmed', 'confirmed'))
+        self.assertFalse(can_transition('delivered', 'cancelled'))
+        self.assertFalse(can_transition('cancelled', 'pending'))
+        self.assertEqual(allowed_sources('pending'), [])
+        with self.assertRaises(ValueError):
+            allowed_sources('lost')
+
+    def test_transition_moves_allowed_orders_and_skips_the_rest(self):
+        pending, processing = self.make_order(10), self.make_order(20, 'processing')
+        delivered = self.make_order(30, 'delivered')
+        moved, skipped = transition(Order.objects.all(), 'shipped', actor=self.user)
+        self.assertEqual((moved, skipped), (2, 1))
+        self.assertEqual(
+            dict(Order.objects.values_list('pk', 'status')),
+            {pending.pk: 'shipped', processing.pk: 'shipped', delivered.pk: 'delivered'},
+        )
+        self.assertEqual(
+            sorted(OrderStatusEvent.objects.values_list('order_id', 'from_status', 'to_status', 'actor')),
+            [(pending.pk, 'pending', 'shipped', self.user.pk), (processing.pk, 'processing', 'shipped', self.user.pk)],
+        )
+
+    def test_transition_applies_stats_deltas(self):
+        first, second = self.make_order(10), self.make_order(Decimal('20.50'))
+        self.assertStats(order_count=2, total_spent=Decimal('30.50'), pending_count=2)
+
+        transition(Order.objects.filter(pk=first.pk), 'confirmed')
+        self.assertStats(order_count=2, total_spent=Decimal('30.50'), pending_count=1, confirmed_count=1)
+
+        # Cancelled orders still count, but not towards money spent
+        transition(Order.objects.filter(pk=second.pk), 'cancelled')
+        self.assertStats(
+            order_count=2, total_spent=Decimal('10.00'), pending_count=0, confirmed_count=1, cancelled_count=1,
+        )
+
+    def test_rejected_transition_changes_nothing(self):
+        order = self.make_order(10, 'delivered')
+        self.assertEqual(transition(Order.objects.filter(pk=order.pk), 'cancelled'), (0, 1))
+        self.assertFalse(OrderStatusEvent.objects.exists())
+        self.assertStats(order_count=1, total_spent=Decimal('10.00'), delivered_count=1, cancelled_count=0)
+
+
+class RebuildStatsTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.users = [User.objects.create_user(username=name, password='x') for name in 'abc']
+        for user, totals in zip(self.users, ([10, 20], [5], [])):
+            for total in totals:
+                Order.objects.create(user=user, name='A', phone='1', address='X', total_amount=total)
+        self.expected = {
+            user.pk: stats.compute([user.pk])[user.pk] for user in self.users[:2]
+        }
+
+    def stored(self):
+        return {
+            row['user_id']: {field: row[field] for field in stats.COUNTED_FIELDS}
+            for row in CustomerOrderStats.objects.values('user_id', *stats.COUNTED_FIELDS)
+        }
+
+    def drift(self):
+        a, b, _ = self.users
+        CustomerOrderStats.objects.filter(user=a).update(order_count=7, total_spent=1)
+        CustomerOrderStats.objects.filter(user=b).delete()
+
+    def test_kept_stats_need_no_rebuild(self):
+        self.assertEqual(self.stored(), self.expected)
+        self.assertEqual(list(stats.rebuild()), [])
+
+    def test_rebuild_reports_and_fixes_drift(self):
+        self.drift()
+        a, b, _ = self.users
+        drifted = {user_id: stored for user_id, stored, _ in stats.rebuild(batch_size=1, fix=False)}
+        self.assertEqual(set(drifted), {a.pk, b.pk})
+        self.assertIsNone(drifted[b.pk])
+        self.assertEqual(drifted[a.pk]['order_count'], 7)
+        self.assertNotEqual(self.stored(), self.expected)
+
+        self.assertEqual(len(list(stats.rebuild(batch_size=1))), 2)
+        # Customers without orders don't get a row
+        self.assertEqual(self.stored(), self.expected)
+
+    def test_check_fails_on_drift_without_fixing(self):
+        self.drift()
+        stdout = StringIO()
+        with self.assertRaisesMessage(CommandError, '2 customers have drifted stats'):
+            call_command('rebuild_order_stats', '--check', verbosity=2, stdout=stdout)
+        self.assertIn(f"user {self.users[0].pk}: {{'order_count': (7, 2), 'total_spent': (Decimal('1.00'), Decimal('30.00'))}}", stdout.getvalue())
+        self.assertIn(f'user {self.users[1].pk}: missing', stdout.getvalue())
+        self.assertNotEqual(self.stored(), self.expected)
+
+        stdout = StringIO()
+        call_command('rebuild_order_stats', '--batch-size', '2', stdout=stdout)
+        self.assertIn('2 drifted customers fixed', stdout.getvalue())
+        self.assertEqual(self.stored(), self.expected)
+
+        stdout = StringIO()
+        call_command('rebuild_order_stats', '--check', stdout=stdout)
+        self.assertIn('0 drifted customers found', stdout.getvalue())
+
+class OrderHistoryViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='a', password='x')
+        other = get_user_model().objects.create_user(username='b', password='x')
+        category = Category.objects.create(name='Gul', slug='gul')
+        self.products = [
+            Product.objects.create(category=category, name=f'Gul {n}', slug=f'gul-{n}', price=10)
+            for n in range(3)
+        ]
+        self.orders = []
+        for n in range(25):
+            order = Order.objects.create(user=self.user, name='A', phone='1', address='X', total_amount=10 * (n + 1))
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=1, price=10) for product in self.products[:n % 3 + 1]
+            )
+            self.orders.append(order)
+        Order.objects.create(user=other, name='B', phone='1', address='X', total_amount=5)
+        transition(Order.objects.filter(pk=self.orders[0].pk), 'cancelled')
+        self.orders.reverse()
+        self.client.login(username='a', password='x')
+
+    def get(self, page=None):
+        return self.client.get(reverse('orders:history'), {'page': page} if page else {})
+
+    @override_settings(ORDERS_PER_PAGE=10)
+    def test_pages_newest_first(self):
+        seen = []
+        for number, size in ((1, 10), (2, 10), (3, 5)):
+            orders = self.get(number).context['orders']
+            self.assertEqual(len(orders), size)
+            seen += orders
+        self.assertEqual([order.pk for order in seen], [order.pk for order in self.orders])
+        self.assertEqual([order.item_count for order in seen[:3]], [1, 3, 2])
+        # Out of range pages show the last one
+        self.assertEqual(self.get(99).context['page'].number, 3)
+
+    def test_totals_come_from_the_stats_row(self):
+        response = self.get()
+        counts = response.context['status_counts']
+        self.assertEqual((counts['total'], counts['pending'], counts['cancelled']), (25, 24, 1))
+        self.assertEqual(response.context['stats'].total_spent, sum(range(20, 251, 10)))
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        # session, user, stats, keys, orders, items + products, and the
+        # header's cart and wishlist counts
+        with override_settings(ORDERS_PER_PAGE=5), self.assertNumQueries(8):
+            self.get()
+        with override_settings(ORDERS_PER_PAGE=25), self.assertNumQueries(8):
+            self.get()
+
+@override_settings(ORDER_STATUS_POLL_INTERVAL=0.05, ORDER_STATUS_MAX_WAIT=5)
+class OrderStatusTests(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(name='A', phone='1', address='X', total_amount=10)
+        self.url = reverse('orders:status', args=[self.order.order_id])
+
+    async def test_unchanged_status_is_not_modified(self):
+        first = await self.async_client.get(self.url)
+        self.assertEqual(first.json()['status'], 'pending')
+        second = await self.async_client.get(self.url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 304)
+
+    async def test_long_poll_answers_when_the_status_changes(self):
+        etag = (await self.async_client.get(self.url))['ETag']
+
+        async def confirm_later():
+            await asyncio.sleep(0.3)
+            await sync_to_async(transition)(Order.objects.filter(pk=self.order.pk), 'confirmed')
+
+        started = time.monotonic()
+        response, _ = await asyncio.gather(
+            self.async_client.get(self.url, {'wait': 5}, headers={'If-None-Match': etag}),
+            confirm_later(),
+        )
+        elapsed = time.monotonic() - started
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'confirmed')
+        self.assertNotEqual(response['ETag'], etag)
+        # Held until the change, not for the whole wait
+        self.assertGreaterEqual(elapsed, 0.3)
+        self.assertLess(elapsed, 3)
+
+    async def test_long_poll_gives_up_after_the_wait(self):
+        etag = (await self.async_client.get(self.url))['ETag']
+        started = time.monotonic()
+        response = await self.async_client.get(self.url, {'wait': 0.2}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+    def test_wsgi_requests_do_not_wait(self):
+        etag = self.client.get(self.url)['ETag']
+        started = time.monotonic()
+        response = self.client.get(self.url, {'wait': 5}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertLess(time.monotonic() - started, 1)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='a', password='x')
+        category = Category.objects.create(name='Gul', slug='gul')
+        self.product = Product.objects.create(category=category, name='Gul', slug='gul', price=10)
+        self.now = timezone.now()
+
+    def make_order(self, status='delivered', age=timedelta(days=100), created=None):
+        order = Order.objects.create(user=self.user, name='A', phone='1', address='X', total_amount=10)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=10)
+        if status != 'pending':
+            transition(Order.objects.filter(pk=order.pk), status)
+        Order.objects.filter(pk=order.pk).update(
+            updated_at=self.now - age, created_at=created or self.now - age,
+        )
+        return order
+
+    def test_moves_finished_old_orders_with_items_and_events(self):
+        old = self.make_order()
+        cancelled = self.make_order('cancelled')
+        recent = self.make_order(age=timedelta(days=1))
+        pending = self.make_order('pending')
+
+        self.assertEqual(archive.archive(batch_size=1), 2)
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', flat=True)), {old.pk, cancelled.pk})
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)), {recent.pk, pending.pk})
+        self.assertEqual(ArchivedOrder.objects.get(pk=old.pk).order_id, old.order_id)
+        self.assertEqual(ArchivedOrderItem.objects.filter(order_id=old.pk).count(), 1)
+        self.assertEqual(
+            list(ArchivedOrderStatusEvent.objects.filter(order_id=old.pk).values_list('from_status', 'to_status')),
+            [('pending', 'delivered')],
+        )
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[old.pk, cancelled.pk]).exists())
+        self.assertFalse(OrderStatusEvent.objects.filter(order_id__in=[old.pk, cancelled.pk]).exists())
+
+    def test_failed_batch_leaves_everything_in_place(self):
+        order = self.make_order()
+        with mock.patch.object(ArchivedOrderStatusEvent.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                archive.archive()
+        self.assertFalse(ArchivedOrder.objects.exists())
+        self.assertFalse(ArchivedOrderItem.objects.exists())
+        self.assertTrue(Order.objects.filter(pk=order.pk).exists())
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 1)
+
+    def test_stats_survive_archiving(self):
+        self.make_order()
+        self.make_order('cancelled')
+        self.make_order('pending')
+        fields = ['order_count', 'total_spent', 'delivered_count', 'cancelled_count', 'pending_count']
+        before = CustomerOrderStats.objects.filter(user=self.user).values(*fields).get()
+        archive.archive()
+        self.assertEqual(CustomerOrderStats.objects.filter(user=self.user).values(*fields).get(), before)
+        computed = stats.compute([self.user.pk])[self.user.pk]
+        self.assertEqual({field: computed[field] for field in fields}, before)
+
+    def test_views_fall_back_to_the_archive(self):
+        order = self.make_order()
+        archive.archive()
+        self.client.force_login(self.user)
+        for url in (
+            reverse('orders:detail', args=[order.pk]),
+            reverse('orders:track', args=[order.order_id]),
+            reverse('orders:success', args=[order.order_id]),
+        ):
+            self.assertContains(self.client.get(url), order.order_id)
+        self.assertEqual(self.client.get(reverse('orders:status', args=[order.order_id])).json()['status'], 'delivered')
+
+    def make_history(self, count=7):
+        # Hot and archived orders interleaved in created_at order
+        orders = [
+            self.make_order('delivered' if i % 2 else 'pending', created=self.now - timedelta(days=200 - i))
+            for i in range(count)
+        ]
+        archive.archive()
+        self.assertEqual(ArchivedOrder.objects.count(), count // 2)
+        return [order.pk for order in reversed(orders)]
+
+    def history(self, per_page=3, count=None):
+        pks, number = [], 1
+        while True:
+            page = archive.history_page(self.user, number, per_page, count=count)
+            pks += [order.pk for order in page.object_list]
+            if not page.has_next():
+                return pks, page.paginator.num_pages
+            number = page.next_page_number()
+
+    def test_history_pages_through_both_tables_newest_first(self):
+        expected = self.make_history()
+        self.assertEqual(self.history(), (expected, 3))
+        self.assertEqual(self.history(count=len(expected)), (expected, 3))
+        page = archive.history_page(self.user, 2, 3)
+        self.assertEqual([order.item_count for order in page.object_list], [1, 1, 1])
+
+    def test_history_with_drifted_count(self):
+        expected = self.make_history()
+        # Too low would cut the history short, too high would end it with empty pages
+        for count in (2, 4, 12):
+            self.assertEqual(self.history(count=count), (expected, 3))
+        self.assertEqual(
+            [o.pk for o in archive.history_page(self.user, 3, 3, count=4).object_list], expected[6:],
+        )
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Gul', slug='gul')
+        self.product = Product.objects.create(category=category, name='Gul', slug='gul', price=10)
+        self.start = timezone.now().replace(microsecond=0) - timedelta(days=10)
+
+    def make_order(self, day, archived=False, items=1):
+        created = self.start + timedelta(days=day)
+        fields = dict(name='A', phone='1', address='X', total_amount=10 * items, status='delivered')
+        if archived:
+            order = ArchivedOrder.objects.create(
+                id=1000 + day, order_id=f'A{day}', created_at=created, updated_at=created, **fields,
+            )
+            item_model = ArchivedOrderItem
+        else:
+            order = Order.objects.create(**fields)
+            Order.objects.filter(pk=order.pk).update(created_at=created)
+            item_model = OrderItem
+        for _ in range(items):
+            item_model.objects.create(order=order, product=self.product, quantity=1, price=10)
+        return order.order_id
+
+    def export(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('export_orders', '--format', 'jsonl', *args, stdout=stdout, stderr=stderr)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        return [row['order_id'] for row in rows], stderr.getvalue()
+
+    def test_hot_and_archived_orders_merge_by_created_at(self):
+        expected = [
+            self.make_order(1, archived=True),
+            self.make_order(2, items=2),
+            self.make_order(3, archived=True),
+            self.make_order(4),
+        ]
+        expected.insert(2, expected[1])
+        exported, stderr = self.export()
+        self.assertEqual(exported, expected)
+        self.assertIn('Exported 5 order lines', stderr)
+        created = [row['created_at'] for row in export.iter_all_rows()]
+        self.assertEqual(created, sorted(created))
+
+    def test_since_resumes_where_an_export_stopped(self):
+        ids = [self.make_order(day, archived=day % 2 == 0) for day in range(1, 7)]
+        _, stderr = self.export('--until', (self.start + timedelta(days=3, hours=12)).isoformat())
+        self.assertIn('Exported 3 order lines', stderr)
+        last = stderr.split('Last created_at: ')[1].split(' ')[0]
+        # The last order is repeated (same instant), the rest follows
+        exported, _ = self.export('--since', last)
+        self.assertEqual(exported, ids[2:])
+
+    def test_since_takes_a_plain_date(self):
+        ids = [self.make_order(day) for day in range(1, 4)]
+        exported, _ = self.export('--since', (self.start + timedelta(days=2)).date().isoformat())
+        self.assertEqual(exported, ids[1:])
+        with self.assertRaisesMessage(CommandError, 'Not a date or datetime: soon'):
+            self.export('--since', 'soon')
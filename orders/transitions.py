@@ -0,0 +1,77 @@
+# orders/transitions.py
+"""
+Order status transitions.
+
+Orders move forward through STATUS_FLOW (steps may be skipped, e.g.
+pending -> shipped) and can be cancelled until they are delivered.
+Delivered and cancelled are final.
+
+transition() moves a whole queryset with one UPDATE and one bulk insert of
+OrderStatusEvents. QuerySet.update() bypasses the Order signals, so the
+customer stats are adjusted here and other apps (inventory) listen to the
+status_changed signal.
+"""
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import stats
+from .models import Order, OrderStatusEvent
+
+STATUS_FLOW = ['pending', 'confirmed', 'processing', 'shipped', 'delivered']
+CANCELLED = 'cancelled'
+
+# Sent with order_ids and status after orders changed status, both for
+# bulk transitions and for single orders saved with a new status.
+status_changed = Signal()
+
+
+def allowed_sources(status):
+    """Statuses an order may move to `status` from"""
+    if status == CANCELLED:
+        return STATUS_FLOW[:-1]
+    if status not in STATUS_FLOW:
+        raise ValueError(f'Unknown order status {status!r}')
+    return STATUS_FLOW[:STATUS_FLOW.index(status)]
+
+
+def can_transition(from_status, to_status):
+    return from_status in allowed_sources(to_status)
+
+
+def transition(orders, status, actor=None, batch_size=1000):
+    """
+    Move every order in the queryset that may go to `status` there.
+    Returns (moved, skipped) counts.
+    """
+    sources = allowed_sources(status)
+    with transaction.atomic():
+        # Locks the rows on databases with FOR UPDATE; SQLite holds the
+        # write lock for the whole (IMMEDIATE) transaction anyway.
+        rows = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=orders.values('pk'), status__in=sources)
+            .values_list('pk', 'status', 'user_id', 'total_amount')
+        )
+        skipped = orders.count() - len(rows)
+        if not rows:
+            return 0, skipped
+
+        now = timezone.now()
+        order_ids = [pk for pk, *_ in rows]
+        # Same rows as above (they are locked), without a huge IN list
+        Order.objects.filter(pk__in=orders.values('pk'), status__in=sources).update(
+            status=status, updated_at=now,
+        )
+        OrderStatusEvent.objects.bulk_create(
+            [
+                OrderStatusEvent(order_id=pk, from_status=old, to_status=status, actor=actor, created_at=now)
+                for pk, old, _, _ in rows
+            ],
+            batch_size=batch_size,
+        )
+        stats.record_changes(
+            (user_id, (old, total), (status, total)) for _, old, user_id, total in rows
+        )
+        status_changed.send(sender=Order, order_ids=order_ids, status=status)
+    return len(rows), skipped
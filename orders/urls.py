@@ -11,4 +11,5 @@ urlpatterns = [
     path('history/', views.order_history, name='history'),  
     path('detail/<int:order_id>/', views.order_detail, name='detail'),
     path('track/<str:order_id>/', views.track_order, name='track'),
+    path('track/<str:order_id>/status/', views.order_status, name='status'),
 ]
\ No newline at end of file
@@ -1,150 +1,189 @@
 # orders/views.py
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse
+from django.shortcuts import render, redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags, quote_etag
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from products.models import Product
-from .models import Order, OrderItem
-import random
-from datetime import datetime
+from cart.cart import Cart
+from gulshop.routers import use_replica
+from . import archive, idempotency
+from .ids import normalize_order_id
+from .models import ArchivedOrder, Order
+from .services import CUSTOMER_FIELDS, place_order
+from .stats import get_stats
 
 def checkout(request):
     """
-    Simple checkout page - NO ERRORS
+    Checkout page; the order itself is placed by services.place_order.
+    Every form carries an idempotency key, so a repeated POST (double
+    click, mobile retry) gets the first one's redirect instead of a
+    second order.
     """
-    cart = request.session.get('cart', {})
-    
-    # Check if cart is empty
-    if not cart:
-        messages.warning(request, 'Your cart is empty!')
-        return redirect('products:cart_detail')
+    cart = Cart(request)
+    attempt = None
     
-    # Get cart items with proper error handling
-    cart_items = []
-    total_amount = 0
-    
-    for product_id, quantity in cart.items():
-        try:
-            product = Product.objects.get(id=int(product_id))
-            # Fix: Handle if quantity is dict or int
-            if isinstance(quantity, dict):
-                qty = quantity.get('quantity', 1)
-            else:
-                qty = quantity
-                
-            item_total = product.price * qty
-            cart_items.append({
-                'product': product,
-                'quantity': qty,
-                'total': item_total
-            })
-            total_amount += item_total
-        except (Product.DoesNotExist, ValueError):
-            continue
+    if request.method == 'POST' and request.POST.get('idempotency_key'):
+        attempt = idempotency.claim(idempotency.get_owner(request), request.POST['idempotency_key'])
+        if attempt.order is not None:
+            return redirect('orders:success', order_id=attempt.order.order_id)
+        if not attempt.claimed:
+            messages.info(request, 'Your order is still being placed. Please check your orders in a moment.')
+            return redirect('orders:history' if request.user.is_authenticated else 'products:home')
     
-    if request.method == 'POST':
-        # Get form data
-        name = request.POST.get('name', '').strip()
-        email = request.POST.get('email', '').strip()
-        phone = request.POST.get('phone', '').strip()
-        address = request.POST.get('address', '').strip()
-        city = request.POST.get('city', '').strip()
-        state = request.POST.get('state', '').strip()
-        pincode = request.POST.get('pincode', '').strip()
-        
-        # Simple validation
-        if not name or not phone or not address:
-            messages.error(request, 'Please fill required fields!')
-            return render(request, 'orders/create.html', {
-                'cart_items': cart_items,
-                'total_amount': total_amount
-            })
-        
-        # Generate simple order ID
-        order_id = f"ORD{datetime.now().strftime('%Y%m%d')}{random.randint(1000, 9999)}"
+    try:
+        # Check if cart is empty
+        if not cart.cart:
+            messages.warning(request, 'Your cart is empty!')
+            return redirect('products:cart_detail')
         
-        try:
-            # Create order
-            order = Order.objects.create(
-                user=request.user if request.user.is_authenticated else None,
-                order_id=order_id,
-                name=name,
-                email=email,
-                phone=phone,
-                address=address,
-                city=city,
-                state=state,
-                pincode=pincode,
-                total_amount=total_amount,
-                status='pending'
-            )
+        form_data = {}
+        if request.method == 'POST':
+            # Get form data
+            customer = {field: request.POST.get(field, '').strip() for field in CUSTOMER_FIELDS}
+            form_data = customer
             
-            # Create order items
-            for product_id, quantity in cart.items():
-                try:
-                    product = Product.objects.get(id=int(product_id))
-                    if isinstance(quantity, dict):
-                        qty = quantity.get('quantity', 1)
-                    else:
-                        qty = quantity
-                        
-                    OrderItem.objects.create(
-                        order=order,
-                        product=product,
-                        quantity=qty,
-                        price=product.price
-                    )
-                except (Product.DoesNotExist, ValueError):
-                    continue
-            
-            # Clear cart
-            if 'cart' in request.session:
-                del request.session['cart']
-            
-            # Redirect to success
-            return redirect('orders:success', order_id=order.order_id)
-            
-        except Exception as e:
-            messages.error(request, f'Error: {str(e)}')
+            # Simple validation
+            if not customer['name'] or not customer['phone'] or not customer['address']:
+                messages.error(request, 'Please fill required fields!')
+            else:
+                result = place_order(
+                    cart, customer, user=request.user,
+                    idempotency_key=attempt.record if attempt else None,
+                )
+                if result.ok:
+                    attempt = None
+                    cart.clear()
+                    return redirect('orders:success', order_id=result.order.order_id)
+                for error in result.errors:
+                    messages.error(request, error)
+    finally:
+        if attempt is not None:
+            idempotency.release(attempt.record)
     
+    snapshot = cart.snapshot()
     return render(request, 'orders/create.html', {
-        'cart_items': cart_items,
-        'total_amount': total_amount
+        'cart_items': snapshot.lines,
+        'total_amount': snapshot.total_price,
+        'form_data': form_data,
+        'idempotency_key': idempotency.new_key(),
     })
 
 def order_success(request, order_id):
     """
     Order success page
     """
-    try:
-        order = Order.objects.get(order_id=order_id)
-        return render(request, 'orders/created.html', {'order': order})
-    except Order.DoesNotExist:
+    order = archive.get_order(order_id=order_id)
+    if order is None:
         messages.error(request, 'Order not found!')
         return redirect('products:home')
+    return render(request, 'orders/created.html', {'order': order})
 
 @login_required
 def order_history(request):
     """
-    View order history
+    View order history (hot and archived orders), one page at a time.
+    Read from the replica, if any; right after checkout the customer is
+    pinned to the primary (gulshop.routers).
     """
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'orders/order_history.html', {'orders': orders})
+    with use_replica():
+        stats = get_stats(request.user)
+        page = archive.history_page(
+            request.user,
+            request.GET.get('page'),
+            getattr(settings, 'ORDERS_PER_PAGE', 20),
+            # The stats row already knows the total; spare the COUNT(*) query
+            count=stats.order_count,
+        )
+    return render(request, 'orders/order_history.html', {
+        'orders': page.object_list,
+        'page': page,
+        'stats': stats,
+        'status_counts': stats.status_counts(),
+    })
 
 @login_required
 def order_detail(request, order_id):
     """
     View order details
     """
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = archive.get_order(id=order_id, user=request.user)
+    if order is None:
+        raise Http404('Order not found')
     return render(request, 'orders/order_detail.html', {'order': order})
 
 def track_order(request, order_id):
     """
     Track order
     """
-    try:
-        order = Order.objects.get(order_id=order_id)
-        return render(request, 'orders/track_order.html', {'order': order})
-    except Order.DoesNotExist:
+    order = archive.get_order(order_id=normalize_order_id(order_id))
+    if order is None:
         messages.error(request, 'Order not found!')
-        return redirect('products:home')
\ No newline at end of file
+        return redirect('products:home')
+    events = order.status_events.all()
+    return render(request, 'orders/track_order.html', {'order': order, 'events': events})
+
+def _status_etag(order):
+    return quote_etag(f'{order.order_id}:{order.status}:{order.updated_at.timestamp()}')
+
+async def _get_status(order_id):
+    for model in (Order, ArchivedOrder):
+        order = await (
+            model.objects.only('order_id', 'status', 'updated_at')
+            .filter(order_id=order_id)
+            .afirst()
+        )
+        if order is not None:
+            return order
+    return None
+
+async def order_status(request, order_id):
+    """
+    Order status as JSON for polling clients, with ETag/Last-Modified so
+    an unchanged order costs a 304.
+
+    ?wait=N (seconds) long-polls: if the client's If-None-Match is still
+    current, hold the request until the status changes or N seconds pass.
+    Waiting only happens under ASGI (gulshop/asgi.py), where it doesn't
+    pin a worker; under WSGI the request answers at once.
+    """
+    order_id = normalize_order_id(order_id)
+    order = await _get_status(order_id)
+    if order is None:
+        raise Http404('Order not found')
+
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        wait = 0
+    wait = min(max(wait, 0), getattr(settings, 'ORDER_STATUS_MAX_WAIT', 30))
+    if isinstance(request, ASGIRequest) and wait:
+        interval = getattr(settings, 'ORDER_STATUS_POLL_INTERVAL', 1.0)
+        deadline = time.monotonic() + wait
+        known = parse_etags(request.headers.get('If-None-Match', ''))
+        while _status_etag(order) in known and time.monotonic() < deadline:
+            await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+            order = await _get_status(order_id)
+            if order is None:
+                raise Http404('Order not found')
+
+    etag = _status_etag(order)
+    last_modified = int(order.updated_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse({
+            'order_id': order.order_id,
+            'status': order.status,
+            'status_display': order.get_status_display(),
+            'updated_at': order.updated_at.isoformat(),
+        })
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
@@ -0,0 +1,133 @@
+# products/catalog.py
+"""
+Versioned read cache for the catalog pages.
+
+Every cached entry is keyed on the current catalog version. Saving or
+deleting a Product or Category bumps the version (see products.signals),
+which makes all older entries unreachable at once; they simply expire.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from gulshop import metrics
+from gulshop.routers import use_primary
+from .models import Product, Category
+from .pagination import DEFAULT_SORT, SORTS, decode_cursor, paginate
+
+VERSION_KEY = 'catalog:version'
+# Cached in place of a product that doesn't exist: None would read as a miss
+NOT_FOUND = 'catalog:not-found'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def _incr(key, delta=1):
+    # cache.add is a no-op if the key exists, so this never resets a counter
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached catalog entry"""
+    return _incr(VERSION_KEY)
+
+
+def get_stats():
+    return {
+        'version': get_version(),
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def _cached(name, build):
+    key = f'catalog:{get_version()}:{name}'
+    value = cache.get(key)
+    if value is not None:
+        _incr(HITS_KEY)
+        metrics.inc(metrics.CACHE_REQUESTS, cache='catalog', result='hit')
+        return value
+    _incr(MISSES_KEY)
+    metrics.inc(metrics.CACHE_REQUESTS, cache='catalog', result='miss')
+    # Never from a read replica: a lagging copy would stay cached until
+    # the next version bump
+    with use_primary():
+        value = build()
+    cache.set(key, value, timeout=_timeout())
+    return value
+
+
+def get_categories():
+    return _cached('categories', lambda: list(Category.objects.all()))
+
+
+def get_category(slug):
+    """Category with the given slug, or None"""
+    for category in get_categories():
+        if category.slug == slug:
+            return category
+    return None
+
+
+def get_product(product_id):
+    """Product (with its category) by id, or None"""
+    product = _cached(
+        f'product:{product_id}',
+        lambda: Product.objects.select_related('category').filter(pk=product_id).first() or NOT_FOUND,
+    )
+    return None if product == NOT_FOUND else product
+
+
+def get_featured_products(limit=4):
+    return _cached(
+        f'featured:{limit}',
+        lambda: list(Product.objects.filter(available=True)[:limit]),
+    )
+
+
+def get_product_page(category=None, sort=DEFAULT_SORT, cursor=None):
+    """One keyset page of available products (see products.pagination)"""
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    # Garbage cursors fall back to the first page and share its cache entry
+    if decode_cursor(cursor, sort) is None:
+        cursor = None
+    per_page = getattr(settings, 'PRODUCTS_PER_PAGE', 24)
+
+    queryset = Product.objects.filter(available=True)
+    scope = 'all'
+    if category is not None:
+        queryset = queryset.filter(category=category)
+        scope = category.pk
+    return _cached(
+        f'page:{scope}:{sort}:{per_page}:{cursor or ""}',
+        lambda: paginate(queryset, sort, cursor, per_page),
+    )
+
+
+def warm():
+    """Fill the cache for the current version, e.g. right after a deploy"""
+    categories = get_categories()
+    get_featured_products()
+    for sort in SORTS:
+        get_product_page(sort=sort)
+        for category in categories:
+            get_product_page(category, sort=sort)
+    return len(categories)
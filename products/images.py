@@ -0,0 +1,129 @@
+# products/images.py
+"""
+Responsive derivatives for Product.image.
+
+For every width in PRODUCT_IMAGE_WIDTHS that is smaller than the original
+we store AVIF, WebP and JPEG copies next to it:
+
+    products/gul.png -> products/gul.w480.avif, products/gul.w480.webp, ...
+
+What was generated is recorded on Product.image_derivatives so templates
+can build srcset without touching the storage.
+"""
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+DEFAULT_WIDTHS = (240, 480, 960)
+
+# Best first; the last one is the <img> fallback every browser supports
+FORMATS = ('avif', 'webp', 'jpeg')
+
+SAVE_OPTIONS = {
+    'avif': {'format': 'AVIF', 'quality': 55},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+
+def get_widths():
+    return tuple(sorted(getattr(settings, 'PRODUCT_IMAGE_WIDTHS', DEFAULT_WIDTHS)))
+
+
+def supported_formats():
+    """FORMATS this Pillow build can write (AVIF needs Pillow 11.2+ with libavif)"""
+    Image.init()
+    return tuple(fmt for fmt in FORMATS if SAVE_OPTIONS[fmt]['format'] in Image.SAVE)
+
+
+_DERIVATIVE_RE = re.compile(r'\.w\d+\.(avif|webp|jpg)$')
+
+
+def derivative_name(name, width, fmt):
+    root, _ = os.path.splitext(name)
+    return f'{root}.w{width}.{"jpg" if fmt == "jpeg" else fmt}'
+
+
+def is_derivative(name):
+    return bool(_DERIVATIVE_RE.search(name))
+
+
+def derivative_names(manifest):
+    source = manifest.get('source')
+    if not source:
+        return []
+    return [
+        derivative_name(source, width, fmt)
+        for width in manifest.get('widths', [])
+        for fmt in manifest.get('formats', [])
+    ]
+
+
+def _encode(image, fmt):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # JPEG has no alpha channel: flatten onto white
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def generate_derivatives(name, storage=None, force=False):
+    """
+    Create the derivatives for one stored image.
+    Returns the manifest to store on Product.image_derivatives.
+    """
+    storage = storage or default_storage
+    formats = supported_formats()
+
+    with storage.open(name, 'rb') as source:
+        original = Image.open(source)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+
+    # Never upscale: widths past the original are replaced by the original
+    # width itself, so hi-DPI screens still get the sharpest version.
+    widths = [w for w in get_widths() if w < original.width]
+    if original.width <= max(get_widths()):
+        widths.append(original.width)
+
+    for width in widths:
+        height = round(original.height * width / original.width)
+        resized = original.resize((width, height), Image.LANCZOS)
+        for fmt in formats:
+            target = derivative_name(name, width, fmt)
+            if not force and storage.exists(target):
+                continue
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(_encode(resized, fmt)))
+
+    return {'source': name, 'widths': widths, 'formats': list(formats)}
+
+
+def derivative_url(manifest, width, fmt, storage=None):
+    storage = storage or default_storage
+    return storage.url(derivative_name(manifest['source'], width, fmt))
+
+
+def srcset(manifest, fmt, storage=None):
+    return ', '.join(
+        f'{derivative_url(manifest, width, fmt, storage)} {width}w'
+        for width in manifest['widths']
+    )
@@ -0,0 +1,73 @@
+"""Shared file format helpers for import_catalog / export_catalog"""
+import csv
+import json
+import sys
+from dataclasses import dataclass
+
+PRODUCT_FIELDS = ['slug', 'name', 'category', 'category_name', 'description', 'price', 'available', 'image']
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    if path and path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+def open_input(path):
+    if path in (None, '-'):
+        return sys.stdin
+    return open(path, newline='', encoding='utf-8')
+
+
+def open_output(path, stdout):
+    """path, or stdout (the command's self.stdout, so call_command can capture it) for '-'"""
+    if path in (None, '-'):
+        return stdout
+    return open(path, 'w', newline='', encoding='utf-8')
+
+
+@dataclass(frozen=True)
+class BadRow:
+    """Stands in for a line that couldn't be read as a row"""
+    reason: str
+
+
+def read_rows(handle, fmt):
+    """
+    Yield (line_number, row dict) one at a time. A malformed JSONL line
+    yields a BadRow instead, so that one bad line doesn't end the import.
+    """
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = BadRow(f'invalid JSON ({e})')
+            if not isinstance(row, (dict, BadRow)):
+                row = BadRow('expected a JSON object')
+            yield line_number, row
+    else:
+        reader = csv.DictReader(handle)
+        for row in reader:
+            yield reader.line_num, row
+
+
+class RowWriter:
+    def __init__(self, handle, fmt, fields):
+        self.handle = handle
+        self.fmt = fmt
+        self.fields = fields
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(handle, fieldnames=fields)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        else:
+            self.handle.write(json.dumps(row, ensure_ascii=False) + '\n')
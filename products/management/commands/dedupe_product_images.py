@@ -0,0 +1,75 @@
+from collections import defaultdict
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products import catalog, images
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Rename product images to content-hash names, merging byte-identical '
+        'duplicates and rewriting Product.image to point at the single copy'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+        parser.add_argument('--keep-old', action='store_true', help='Do not delete the old files')
+
+    def handle(self, *args, **options):
+        field = Product._meta.get_field('image')
+        storage = field.storage
+        directory = field.upload_to.rstrip('/')
+
+        # old name -> content-addressed name, for every original in the upload dir
+        renames = {}
+        sizes = {}
+        _, files = storage.listdir(directory)
+        for filename in sorted(files):
+            name = f'{directory}/{filename}'
+            if images.is_derivative(name):
+                continue
+            with storage.open(name, 'rb') as content:
+                target = storage.hashed_name(name, content)
+            sizes[name] = storage.size(name)
+            if target != name:
+                renames[name] = target
+
+        groups = defaultdict(list)
+        for name, target in renames.items():
+            groups[target].append(name)
+        duplicates = {target: names for target, names in groups.items() if len(names) > 1}
+        reclaimed = sum(sizes[name] for names in duplicates.values() for name in names[1:])
+
+        for target, names in duplicates.items():
+            self.stdout.write(f'{", ".join(names)} -> {target}')
+        self.stdout.write(
+            f'{len(sizes)} files, {len(renames)} to rename, {len(duplicates)} duplicate groups, '
+            f'{reclaimed / 1024 / 1024:.1f} MB reclaimable'
+        )
+        if options['dry_run'] or not renames:
+            return
+
+        for name, target in renames.items():
+            if not storage.exists(target):
+                with storage.open(name, 'rb') as content:
+                    storage.save(target, content)
+
+        stale = []
+        with transaction.atomic():
+            products = Product.objects.filter(image__in=renames).only('id', 'image', 'image_derivatives')
+            for product in products.select_for_update().iterator():
+                stale.extend(images.derivative_names(product.image_derivatives or {}))
+            for name, target in renames.items():
+                Product.objects.filter(image=name).update(image=target, image_derivatives={})
+        catalog.bump_version()
+
+        if not options['keep_old']:
+            for name in list(renames) + stale:
+                if storage.exists(name):
+                    storage.delete(name)
+
+        self.stdout.write(self.style.SUCCESS(f'Moved {len(renames)} files to {len(groups)} content-addressed names'))
+        call_command('generate_image_derivatives', stdout=self.stdout, stderr=self.stderr)
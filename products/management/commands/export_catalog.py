@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+from ._catalog_io import FORMATS, PRODUCT_FIELDS, RowWriter, detect_format, open_output
+
+
+class Command(BaseCommand):
+    help = 'Stream every product as CSV or JSONL (constant memory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help='File to write (default: stdout)')
+        parser.add_argument('--format', choices=FORMATS, help='Default: from the file extension, else csv')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        fmt = detect_format(options['output'], options['format'])
+        products = (
+            Product.objects.select_related('category')
+            .order_by('pk')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+        handle = open_output(options['output'], self.stdout)
+        count = 0
+        try:
+            writer = RowWriter(handle, fmt, PRODUCT_FIELDS)
+            for product in products:
+                writer.write({
+                    'slug': product.slug,
+                    'name': product.name,
+                    'category': product.category.slug,
+                    'category_name': product.category.name,
+                    'description': product.description,
+                    'price': str(product.price),
+                    'available': product.available,
+                    'image': product.image.name,
+                })
+                count += 1
+        finally:
+            if options['output'] != '-':
+                handle.close()
+        self.stderr.write(f'Exported {count} products')
@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from products import catalog, images
+from products.models import Product
+
+
+def _generate(name, force):
+    # Runs in a worker process: file work only, no database access
+    try:
+        return name, images.generate_derivatives(name, force=force), None
+    except (OSError, ValueError) as e:
+        return name, None, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Create responsive AVIF/WebP/JPEG derivatives for existing product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Number of worker processes (default: one per core)',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate derivatives that already exist',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').only('id', 'image', 'image_derivatives')
+        pending = {}
+        for product in products.iterator():
+            manifest = product.image_derivatives or {}
+            if options['force'] or manifest.get('source') != product.image.name:
+                # Several products may share one file
+                pending.setdefault(product.image.name, []).append(product.pk)
+
+        if not pending:
+            self.stdout.write('All product images are up to date')
+            return
+
+        self.stdout.write(f'Processing {len(pending)} images with {options["workers"]} workers')
+        # Forked workers must not inherit open database connections
+        connections.close_all()
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [pool.submit(_generate, name, options['force']) for name in pending]
+            for future in as_completed(futures):
+                name, manifest, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                    continue
+                Product.objects.filter(pk__in=pending[name]).update(image_derivatives=manifest)
+                done += 1
+
+        catalog.bump_version()
+        self.stdout.write(self.style.SUCCESS(f'Generated derivatives for {done} images ({failed} failed)'))
@@ -0,0 +1,180 @@
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from products import catalog, search
+from products.models import Category, Product
+from ._catalog_io import FORMATS, BadRow, detect_format, open_input, read_rows
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+# Fields compared (and written) when a slug already exists
+UPDATE_FIELDS = ['name', 'category', 'description', 'price', 'available', 'image']
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert products (keyed on slug) from CSV or JSONL in batches. '
+        'Unknown categories are created. Use --dry-run to see the diff.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS, help='Default: from the file extension, else csv')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Print what would change without writing')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        fmt = detect_format(options['path'], options['format'])
+
+        # Categories are few: keep slug -> Category for the whole run
+        self.categories = {c.slug: c for c in Category.objects.all()}
+        self.totals = {'created': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
+
+        handle = open_input(options['path'])
+        try:
+            for batch in _batches(read_rows(handle, fmt), options['batch_size']):
+                self.import_batch(batch)
+        finally:
+            if options['path'] != '-':
+                handle.close()
+
+        if not self.dry_run and (self.totals['created'] or self.totals['updated']):
+            # bulk_create/bulk_update skip signals: invalidate once at the end
+            catalog.bump_version()
+
+        prefix = '[dry run] ' if self.dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            '{}{created} created, {updated} updated, {unchanged} unchanged, {errors} errors'.format(prefix, **self.totals)
+        ))
+
+    def parse(self, line_number, row):
+        if isinstance(row, BadRow):
+            raise CommandError(f'line {line_number}: {row.reason}')
+        slug = (row.get('slug') or '').strip()
+        if not slug:
+            raise CommandError(f'line {line_number}: missing slug')
+        try:
+            price = Decimal(str(row.get('price', '')).strip())
+        except InvalidOperation:
+            raise CommandError(f'line {line_number}: invalid price {row.get("price")!r}')
+        # Decimal() also takes 'NaN', 'Infinity' and negatives
+        if not price.is_finite() or price <= 0:
+            raise CommandError(f'line {line_number}: price must be above zero, got {row.get("price")!r}')
+        category_slug = (row.get('category') or '').strip() or slugify(row.get('category_name') or '')
+        if not category_slug:
+            raise CommandError(f'line {line_number}: missing category')
+        available = row.get('available', True)
+        if not isinstance(available, bool):
+            available = str(available).strip().lower() in TRUE_VALUES
+        return {
+            'slug': slug,
+            'name': (row.get('name') or slug).strip(),
+            'category_slug': category_slug,
+            'category_name': (row.get('category_name') or '').strip() or category_slug.replace('-', ' ').title(),
+            'description': row.get('description') or '',
+            'price': price,
+            'available': available,
+            'image': (row.get('image') or '').strip(),
+        }
+
+    def get_category(self, values, created):
+        category = self.categories.get(values['category_slug'])
+        if category is None:
+            category = Category(slug=values['category_slug'], name=values['category_name'])
+            self.categories[category.slug] = category
+            created.append(category)
+        return category
+
+    def diff(self, product, values, category):
+        changes = {}
+        if product.category_id is None or product.category_id != category.pk:
+            changes['category'] = (product.category.slug, category.slug)
+        for field in ('name', 'description', 'price', 'available'):
+            if getattr(product, field) != values[field]:
+                changes[field] = (getattr(product, field), values[field])
+        if values['image'] and product.image.name != values['image']:
+            changes['image'] = (product.image.name, values['image'])
+        return changes
+
+    def import_batch(self, batch):
+        rows = {}
+        for line_number, row in batch:
+            try:
+                values = self.parse(line_number, row)
+            except CommandError as e:
+                self.totals['errors'] += 1
+                self.stderr.write(str(e))
+                continue
+            # Last row wins for a slug repeated within a batch
+            rows[values['slug']] = values
+
+        verbose = self.dry_run or self.verbosity > 1
+        with transaction.atomic():
+            existing = (
+                Product.objects.filter(slug__in=list(rows))
+                .select_related('category')
+                .in_bulk(field_name='slug')
+            )
+            new_categories = []
+            to_create, to_update = [], []
+            now = timezone.now()
+
+            for slug, values in rows.items():
+                category = self.get_category(values, new_categories)
+                product = existing.get(slug)
+                if product is None:
+                    to_create.append(Product(
+                        slug=slug,
+                        name=values['name'],
+                        category=category,
+                        description=values['description'],
+                        price=values['price'],
+                        available=values['available'],
+                        image=values['image'],
+                    ))
+                    if verbose:
+                        self.stdout.write(f'+ {slug}')
+                    continue
+
+                changes = self.diff(product, values, category)
+                if not changes:
+                    self.totals['unchanged'] += 1
+                    continue
+                if verbose:
+                    diff = ', '.join(f'{field}: {old!r} -> {new!r}' for field, (old, new) in changes.items())
+                    self.stdout.write(f'~ {slug}: {diff}')
+                product.category = category
+                for field in ('name', 'description', 'price', 'available'):
+                    setattr(product, field, values[field])
+                if values['image']:
+                    product.image = values['image']
+                # bulk_update doesn't apply auto_now
+                product.updated = now
+                to_update.append(product)
+
+            for category in new_categories:
+                if verbose:
+                    self.stdout.write(f'+ category {category.slug}')
+
+            if not self.dry_run:
+                # Products pick up the new category ids when they are saved
+                Category.objects.bulk_create(new_categories)
+                Product.objects.bulk_create(to_create)
+                Product.objects.bulk_update(to_update, UPDATE_FIELDS + ['updated'])
+                search.index_products(to_create + to_update)
+
+        self.totals['created'] += len(to_create)
+        self.totals['updated'] += len(to_update)
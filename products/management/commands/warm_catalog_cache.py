@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from products import catalog
+
+
+class Command(BaseCommand):
+    help = 'Pre-fill the catalog read cache (run after deploy) and report hit/miss counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Only print the cache counters, do not warm',
+        )
+
+    def handle(self, *args, **options):
+        if not options['stats']:
+            count = catalog.warm()
+            self.stdout.write(self.style.SUCCESS(f'Warmed catalog cache for {count} categories'))
+
+        stats = catalog.get_stats()
+        self.stdout.write(
+            f"version={stats['version']} hits={stats['hits']} misses={stats['misses']}"
+        )
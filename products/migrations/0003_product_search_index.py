@@ -0,0 +1,66 @@
+# Full-text search side table for products.search.
+# SQLite gets an FTS5 virtual table, Postgres a tsvector column + GIN index.
+
+from django.db import migrations
+
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_search USING fts5(
+    name, description, category,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+SQLITE_POPULATE = """
+INSERT INTO products_search (rowid, name, description, category)
+SELECT p.id, p.name, p.description, c.name
+FROM products_product p JOIN products_category c ON c.id = p.category_id
+WHERE p.available
+"""
+
+POSTGRES_CREATE = """
+CREATE TABLE IF NOT EXISTS products_search (
+    product_id bigint PRIMARY KEY REFERENCES products_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+    name text NOT NULL,
+    description text NOT NULL,
+    category text NOT NULL,
+    document tsvector
+);
+CREATE INDEX IF NOT EXISTS products_search_document_idx ON products_search USING GIN (document)
+"""
+
+POSTGRES_POPULATE = """
+INSERT INTO products_search (product_id, name, description, category, document)
+SELECT p.id, p.name, p.description, c.name,
+       setweight(to_tsvector('simple', p.name), 'A') ||
+       setweight(to_tsvector('simple', c.name), 'B') ||
+       setweight(to_tsvector('simple', p.description), 'C')
+FROM products_product p JOIN products_category c ON c.id = p.category_id
+WHERE p.available
+"""
+
+
+def create_search_table(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        schema_editor.execute(SQLITE_POPULATE)
+    elif vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_CREATE)
+        schema_editor.execute(POSTGRES_POPULATE)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS products_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+import products.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_product_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(storage=products.storage.ContentAddressedStorage(), upload_to='products/'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
@@ -16,10 +18,22 @@ class Product(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    image = models.ImageField(upload_to='products/')
+    # Files are named by content hash, so re-uploads are stored only once
+    image = models.ImageField(upload_to='products/', storage=ContentAddressedStorage())
+    # Responsive copies of image, see products.images
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     available = models.BooleanField(default=True)
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        # Keyset pagination indexes (see products.pagination)
+        indexes = [
+            models.Index(fields=['available', '-created', '-id'], name='product_created_idx'),
+            models.Index(fields=['available', 'price', 'id'], name='product_price_idx'),
+            models.Index(fields=['category', 'available', '-created', '-id'], name='product_cat_created_idx'),
+            models.Index(fields=['category', 'available', 'price', 'id'], name='product_cat_price_idx'),
+        ]
+    
     def __str__(self):
         return self.name
\ No newline at end of file
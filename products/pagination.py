@@ -0,0 +1,99 @@
+# products/pagination.py
+"""
+Keyset (cursor) pagination for product listings.
+
+Instead of OFFSET, each page continues strictly after the last row of the
+previous one on an indexed (field, id) pair, so page N costs the same as
+page 1. Cursors are opaque url-safe tokens.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# sort name -> (field, descending); 'id' is always the tie-breaker
+SORTS = {
+    'newest': ('created', True),
+    'price': ('price', False),
+}
+DEFAULT_SORT = 'newest'
+
+MAX_CURSOR_LENGTH = 200
+
+
+@dataclass(frozen=True)
+class KeysetPage:
+    items: tuple = ()
+    next_cursor: str = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(value, pk):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([str(value), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, sort=DEFAULT_SORT):
+    """Return (value, pk) for a cursor token, or None if it is not valid"""
+    if not token or len(token) > MAX_CURSOR_LENGTH:
+        return None
+    field, _ = SORTS[sort]
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, pk = json.loads(raw)
+        pk = int(pk)
+        if field == 'created':
+            value = parse_datetime(value)
+        else:
+            value = Decimal(value)
+            # Decimal() also takes 'NaN' and 'Infinity'
+            if not value.is_finite():
+                return None
+    except (binascii.Error, ValueError, TypeError, InvalidOperation):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+def paginate(queryset, sort=DEFAULT_SORT, cursor=None, per_page=24):
+    field, descending = SORTS[sort]
+    if descending:
+        queryset = queryset.order_by(f'-{field}', '-id')
+        op = 'lt'
+    else:
+        queryset = queryset.order_by(field, 'id')
+        op = 'gt'
+
+    position = decode_cursor(cursor, sort)
+    if position is not None:
+        value, pk = position
+        # The redundant range filter lets the database seek the index
+        # instead of evaluating the OR for every row.
+        queryset = queryset.filter(**{f'{field}__{op}e': value}).filter(
+            Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk})
+        )
+
+    rows = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return KeysetPage(items=tuple(rows), next_cursor=next_cursor)
@@ -0,0 +1,215 @@
+# products/search.py
+"""
+Full-text product search.
+
+Products are mirrored into a 'products_search' side table (created by
+migration 0003) that is kept in sync by products.signals:
+
+* SQLite:   an FTS5 virtual table, rowid = product id, ranked with bm25()
+* Postgres: a weighted tsvector column with a GIN index, ranked with ts_rank()
+
+Other databases fall back to icontains filtering without ranking.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Product
+
+TABLE = 'products_search'
+
+# Sentinels wrapped around matches by the database; swapped for <mark>
+# only after the surrounding text has been HTML-escaped.
+_START, _STOP = '\x02', '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    product: Product
+    rank: float
+    name_html: str
+    snippet_html: str
+
+
+def _terms(query):
+    return _TOKEN_RE.findall(query or '')[:MAX_TERMS]
+
+
+def _highlight(text):
+    return mark_safe(escape(text or '').replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def _rows(products):
+    return [(p.pk, p.name, p.description, p.category.name) for p in products]
+
+
+# ===== INDEX MAINTENANCE =====
+def index_products(products):
+    """
+    Insert or refresh the index rows for the given products.
+    Only available products are kept in the index.
+    """
+    products = list(products)
+    remove_products([p.pk for p in products if not p.available])
+    rows = _rows(p for p in products if p.available)
+    if not rows or connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    ids = [row[0] for row in rows]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'DELETE FROM {TABLE} WHERE rowid IN ({", ".join(["%s"] * len(ids))})', ids
+            )
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, name, description, category) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+        else:
+            cursor.executemany(
+                f"""
+                INSERT INTO {TABLE} (product_id, name, description, category, document)
+                VALUES (%s, %s, %s, %s, NULL)
+                ON CONFLICT (product_id) DO UPDATE SET
+                    name = EXCLUDED.name,
+                    description = EXCLUDED.description,
+                    category = EXCLUDED.category
+                """,
+                rows,
+            )
+            cursor.execute(
+                f"""
+                UPDATE {TABLE} SET document =
+                    setweight(to_tsvector('simple', name), 'A') ||
+                    setweight(to_tsvector('simple', category), 'B') ||
+                    setweight(to_tsvector('simple', description), 'C')
+                WHERE product_id = ANY(%s)
+                """,
+                [ids],
+            )
+
+
+def remove_products(ids):
+    ids = list(ids)
+    if not ids or connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    column = 'rowid' if connection.vendor == 'sqlite' else 'product_id'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE {column} IN ({", ".join(["%s"] * len(ids))})', ids
+        )
+
+
+def rebuild(batch_size=1000):
+    """Re-index the whole catalog; returns the number of products indexed"""
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    count = 0
+    batch = []
+    queryset = Product.objects.filter(available=True).select_related('category')
+    for product in queryset.iterator(chunk_size=batch_size):
+        batch.append(product)
+        if len(batch) >= batch_size:
+            index_products(batch)
+            count += len(batch)
+            batch = []
+    index_products(batch)
+    return count + len(batch)
+
+
+# ===== QUERYING =====
+def _search_sqlite(terms, limit):
+    # Quote every term so FTS5 operators typed by users are taken literally,
+    # and prefix-match the last one for search-as-you-type.
+    match = ' '.join(f'"{term}"' for term in terms[:-1])
+    match = f'{match} "{terms[-1]}"*'.strip()
+    with connection.cursor() as cursor:
+        # Every match is ranked; ORDER BY ... LIMIT keeps only the best
+        # `limit` as it goes instead of sorting them all
+        cursor.execute(
+            f"""
+            SELECT rowid, bm25({TABLE}, 10.0, 1.0, 4.0) AS rank,
+                   highlight({TABLE}, 0, %s, %s),
+                   snippet({TABLE}, 1, %s, %s, '…', 16)
+            FROM {TABLE}
+            WHERE {TABLE} MATCH %s
+            ORDER BY rank
+            LIMIT %s
+            """,
+            [_START, _STOP, _START, _STOP, match, limit],
+        )
+        # bm25() is "lower is better"; flip it so callers can sort descending
+        return [(pk, -rank, name, snippet) for pk, rank, name, snippet in cursor.fetchall()]
+
+
+def _search_postgres(terms, limit):
+    tsquery = ' & '.join(f"{term}:*" for term in terms)
+    options = f'StartSel={_START}, StopSel={_STOP}, MaxWords=24, MinWords=8'
+    with connection.cursor() as cursor:
+        # Rank and limit first so ts_headline only runs on the returned rows
+        cursor.execute(
+            f"""
+            SELECT hit.product_id, hit.rank,
+                   ts_headline('simple', hit.name, hit.query, %s),
+                   ts_headline('simple', hit.description, hit.query, %s)
+            FROM (
+                SELECT s.product_id, s.name, s.description, q.query,
+                       ts_rank(s.document, q.query) AS rank
+                FROM {TABLE} s, to_tsquery('simple', %s) AS q(query)
+                WHERE s.document @@ q.query
+                ORDER BY rank DESC
+                LIMIT %s
+            ) hit
+            ORDER BY hit.rank DESC
+            """,
+            [f'{options}, HighlightAll=true', options, tsquery, limit],
+        )
+        return cursor.fetchall()
+
+
+def _search_fallback(terms, limit):
+    queryset = Product.objects.filter(available=True)
+    for term in terms:
+        queryset = queryset.filter(
+            Q(name__icontains=term) | Q(description__icontains=term) | Q(category__name__icontains=term)
+        )
+    return [
+        (pk, 0.0, name, description[:200])
+        for pk, name, description in queryset.values_list('pk', 'name', 'description')[:limit]
+    ]
+
+
+def search(query, limit=20):
+    """Available products matching query, best match first"""
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    if connection.vendor == 'sqlite':
+        hits = _search_sqlite(terms, limit)
+    elif connection.vendor == 'postgresql':
+        hits = _search_postgres(terms, limit)
+    else:
+        hits = _search_fallback(terms, limit)
+
+    products = Product.objects.filter(available=True).select_related('category').in_bulk(
+        [hit[0] for hit in hits]
+    )
+    return [
+        SearchResult(
+            product=products[pk],
+            rank=rank,
+            name_html=_highlight(name),
+            snippet_html=_highlight(snippet),
+        )
+        for pk, rank, name, snippet in hits
+        if pk in products
+    ]
@@ -0,0 +1,48 @@
+# products/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from . import catalog, search
+from .models import Product, Category
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Any catalog write (including admin list_editable saves) bumps the version"""
+    catalog.bump_version()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, **kwargs):
+    # The category name is part of every product document in it
+    if not created:
+        search.index_products(instance.product_set.select_related('category'))
+
+
+@receiver(post_save, sender=Product)
+def generate_image_derivatives(sender, instance, raw=False, **kwargs):
+    """
+    Queue responsive copies whenever a new image is uploaded. Encoding
+    AVIF/WebP/JPEG at every width takes seconds per photo, so it runs in a
+    jobs worker (products.tasks) rather than in the admin save.
+    """
+    if raw or not instance.image:
+        return
+    if (instance.image_derivatives or {}).get('source') == instance.image.name:
+        return
+    # In the save's transaction: the job exists only if the product does
+    enqueue('products.generate_image_derivatives', product_id=instance.pk)
@@ -0,0 +1,50 @@
+# products/storage.py
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def file_digest(content, chunk_size=64 * 1024):
+    """sha256 of a Django File, read in chunks so large uploads never sit in memory"""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(chunk_size):
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Names files after the sha256 of their content:
+
+        products/premix.png -> products/<sha256>.png
+
+    Uploading the same bytes twice stores them once and returns the
+    existing name instead of adding a random suffix.
+    """
+
+    def hashed_name(self, name, content):
+        directory, filename = os.path.split(name)
+        _, ext = os.path.splitext(filename)
+        return os.path.join(directory, f'{file_digest(content)}{ext.lower()}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(self.generate_filename(name), content)
+        if self.exists(name):
+            return name
+        saved = super().save(name, content, max_length=max_length)
+        if saved != name:
+            # Lost a race with an identical upload; keep the first copy
+            self.delete(saved)
+        return name
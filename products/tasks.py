@@ -0,0 +1,29 @@
+# products/tasks.py
+"""Image work moved out of the request, run by jobs workers (manage.py run_workers)"""
+import logging
+
+from jobs.queue import task
+from . import catalog, images
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+
+@task('products.generate_image_derivatives')
+def generate_image_derivatives(product_id):
+    product = Product.objects.filter(pk=product_id).only('id', 'image', 'image_derivatives').first()
+    if product is None or not product.image:
+        return
+    name = product.image.name
+    if (product.image_derivatives or {}).get('source') == name:
+        return
+    try:
+        manifest = images.generate_derivatives(name)
+    except (OSError, ValueError):
+        # A broken upload won't get better on retry
+        logger.exception('Could not create image derivatives for product %s', product_id)
+        return
+    # Not if the image was replaced meanwhile: that save queued its own job
+    if Product.objects.filter(pk=product_id, image=name).update(image_derivatives=manifest):
+        # update() skips the catalog signals; refresh the cache explicitly
+        catalog.bump_version()
@@ -0,0 +1,40 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from products import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(product, sizes='100vw', **attrs):
+    """
+    <picture> with AVIF/WebP/JPEG srcsets for product.image, e.g.
+    {% responsive_image product sizes="(min-width: 768px) 17vw, 100vw" class="card-img-top" %}
+    Falls back to a plain lazy <img> until derivatives exist.
+    """
+    attrs = {'alt': product.name, 'loading': 'lazy', 'decoding': 'async', **attrs}
+    manifest = product.image_derivatives or {}
+
+    if manifest.get('source') != product.image.name or not manifest.get('widths'):
+        return format_html('<img src="{}"{}>', product.image.url, flatatt(attrs))
+
+    largest = max(manifest['widths'])
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (images.MIME_TYPES[fmt], images.srcset(manifest, fmt), sizes)
+            for fmt in manifest['formats'] if fmt != 'jpeg'
+        ),
+    )
+    fallback = 'jpeg' if 'jpeg' in manifest['formats'] else manifest['formats'][-1]
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        sources,
+        images.derivative_url(manifest, largest, fallback),
+        images.srcset(manifest, fallback),
+        sizes,
+        flatatt(attrs),
+    )
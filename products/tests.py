@@ -1,3 +1,353 @@
-from django.test import TestCase
+import base64
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from jobs import queue
+from jobs.models import Job
+from . import catalog, images, search
+from .models import Category, Product
+from .pagination import MAX_CURSOR_LENGTH, SORTS, decode_cursor, encode_cursor, paginate
+
+
+def png_bytes(size=(600, 400), color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class MediaRootMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.category = Category.objects.create(name='Gul', slug='gul')
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Gul', slug='gul')
+
+    def make_product(self, name, description='', **kwargs):
+        return Product.objects.create(
+            category=self.category, name=name, slug=name.lower().replace(' ', '-'),
+            description=description, price=10, **kwargs,
+        )
+
+    def test_best_match_first_and_highlighted(self):
+        self.make_product('Sugar', 'Plain sugar, not jaggery')
+        best = self.make_product('Jaggery Block', 'Jaggery from sugarcane')
+        results = search.search('jagg')
+        self.assertEqual([r.product for r in results][0], best)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0].name_html, '<mark>Jaggery</mark> Block')
+
+    def test_ranks_all_matches_not_just_the_newest(self):
+        best = self.make_product('Jaggery', 'Jaggery')
+        Product.objects.bulk_create(
+            Product(category=self.category, name=f'Item {i}', slug=f'item-{i}', description='Has jaggery', price=1)
+            for i in range(3000)
+        )
+        search.rebuild()
+        self.assertEqual(search.search('jaggery', limit=1)[0].product, best)
+
+    def test_unavailable_products_are_not_found(self):
+        self.make_product('Jaggery', available=False)
+        self.assertEqual(search.search('jaggery'), [])
+
+    def test_operators_are_taken_literally(self):
+        self.make_product('Jaggery')
+        self.assertEqual(search.search('"AND OR NEAR( *'), [])
+        self.assertEqual(search.search(''), [])
+
+
+class ImportCatalogTests(TestCase):
+    def import_lines(self, lines, suffix='.jsonl'):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix) as handle:
+            handle.write('\n'.join(lines) + '\n')
+            handle.flush()
+            stdout, stderr = StringIO(), StringIO()
+            call_command('import_catalog', handle.name, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_bad_lines_are_counted_and_skipped(self):
+        stdout, stderr = self.import_lines([
+            '{"slug": "a", "category": "gul", "price": "10"}',
+            '{"slug": "b", "category": "gul", "price": ',
+            '[1, 2]',
+            '{"slug": "c", "category": "gul", "price": 12.5}',
+        ])
+        self.assertIn('2 created, 0 updated, 0 unchanged, 2 errors', stdout)
+        self.assertIn('line 2: invalid JSON', stderr)
+        self.assertIn('line 3: expected a JSON object', stderr)
+        self.assertEqual(sorted(Product.objects.values_list('slug', flat=True)), ['a', 'c'])
+
+    def test_prices_must_be_finite_and_positive(self):
+        stdout, stderr = self.import_lines(
+            ['slug,category,price', 'a,gul,NaN', 'b,gul,-1', 'c,gul,0', 'd,gul,Infinity', 'e,gul,x', 'f,gul,3'],
+            suffix='.csv',
+        )
+        self.assertIn('1 created, 0 updated, 0 unchanged, 5 errors', stdout)
+        self.assertEqual(list(Product.objects.values_list('slug', flat=True)), ['f'])
+
+    def test_export_then_import_round_trips(self):
+        gul = Category.objects.create(name='Gul', slug='gul')
+        syrup = Category.objects.create(name='Syrups', slug='syrups')
+        Product.objects.create(category=gul, name='Rose', slug='rose', price='10.50', description='Pink, "fresh"\nand sweet')
+        Product.objects.create(category=syrup, name='Kokum', slug='kokum', price=3, available=False, image='products/k.png')
+        fields = ('slug', 'name', 'category__slug', 'category__name', 'description', 'price', 'available', 'image')
+        before = sorted(Product.objects.values_list(*fields))
+
+        for fmt, suffix in (('csv', '.csv'), ('jsonl', '.jsonl')):
+            with self.subTest(fmt=fmt):
+                stdout, stderr = StringIO(), StringIO()
+                call_command('export_catalog', '--format', fmt, stdout=stdout, stderr=stderr)
+                self.assertIn('Exported 2 products', stderr.getvalue())
+                Product.objects.all().delete()
+                Category.objects.all().delete()
+
+                result, _ = self.import_lines([stdout.getvalue().rstrip('\n')], suffix=suffix)
+                self.assertIn('2 created, 0 updated, 0 unchanged, 0 errors', result)
+                self.assertEqual(sorted(Product.objects.values_list(*fields)), before)
+                result, _ = self.import_lines([stdout.getvalue().rstrip('\n')], suffix=suffix)
+                self.assertIn('0 created, 0 updated, 2 unchanged, 0 errors', result)
+
+
+class ImageDerivativeTests(MediaRootMixin, TestCase):
+    def render(self, product):
+        template = Template('{% load product_images %}{% responsive_image product sizes="50vw" %}')
+        return template.render(Context({'product': product}))
+
+    def test_upload_queues_derivatives_for_the_picture_tag(self):
+        product = Product.objects.create(
+            category=self.category, name='Rose', slug='rose', price=10,
+            image=SimpleUploadedFile('rose.png', png_bytes()),
+        )
+        name = product.image.name
+        self.assertRegex(name, r'^products/[0-9a-f]{64}\.png$')
+        # Nothing encoded in the save itself, only a job queued
+        self.assertEqual(Product.objects.get(pk=product.pk).image_derivatives, {})
+        self.assertTrue(self.render(product).startswith('<img src="/media/products/'))
+
+        jobs = queue.claim()
+        self.assertEqual([(job.name, job.payload) for job in jobs], [
+            ('products.generate_image_derivatives', {'product_id': product.pk}),
+        ])
+        queue.run(jobs[0])
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+        product.refresh_from_db()
+        formats = list(images.supported_formats())
+        self.assertEqual(product.image_derivatives, {'source': name, 'widths': [240, 480, 600], 'formats': formats})
+        for width in (240, 480, 600):
+            for fmt in formats:
+                self.assertTrue(default_storage.exists(images.derivative_name(name, width, fmt)))
+
+        html = self.render(product)
+        self.assertTrue(html.startswith('<picture><source type="image/avif"'))
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn(f'{default_storage.url(images.derivative_name(name, 240, "webp"))} 240w', html)
+        self.assertIn(f'<img src="{default_storage.url(images.derivative_name(name, 600, "jpeg"))}"', html)
+        self.assertTrue(html.endswith('</picture>'))
+
+        # Saving again with the same image doesn't queue more work
+        product.save()
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_same_bytes_are_stored_once(self):
+        first = Product.objects.create(
+            category=self.category, name='Rose', slug='rose', price=10,
+            image=SimpleUploadedFile('rose.png', png_bytes()),
+        )
+        second = Product.objects.create(
+            category=self.category, name='Red', slug='red', price=10,
+            image=SimpleUploadedFile('other-name.PNG', png_bytes()),
+        )
+        self.assertEqual(first.image.name, second.image.name)
+
+
+class DedupeImagesTests(MediaRootMixin, TransactionTestCase):
+    def test_duplicates_merge_into_one_hashed_file(self):
+        rose, tulip = png_bytes(color='red'), png_bytes(color='yellow')
+        for filename, content in (('a.png', rose), ('b.png', rose), ('c.png', tulip)):
+            default_storage.save(f'products/{filename}', ContentFile(content))
+        for slug in 'abc':
+            Product.objects.create(category=self.category, name=slug, slug=slug, price=10)
+            Product.objects.filter(slug=slug).update(image=f'products/{slug}.png')
+
+        stdout = StringIO()
+        call_command('dedupe_product_images', '--dry-run', stdout=stdout)
+        self.assertIn('3 files, 3 to rename, 1 duplicate groups', stdout.getvalue())
+        self.assertTrue(default_storage.exists('products/a.png'))
+
+        call_command('dedupe_product_images', stdout=StringIO(), stderr=StringIO())
+        names = dict(Product.objects.values_list('slug', 'image'))
+        self.assertEqual(names['a'], names['b'])
+        self.assertNotEqual(names['a'], names['c'])
+        for name in names.values():
+            self.assertRegex(name, r'^products/[0-9a-f]{64}\.png$')
+            self.assertTrue(default_storage.exists(name))
+        for filename in ('a.png', 'b.png', 'c.png'):
+            self.assertFalse(default_storage.exists(f'products/{filename}'))
+        # Derivatives are regenerated for the new names
+        for product in Product.objects.all():
+            self.assertEqual(product.image_derivatives['source'], product.image.name)
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.gul = Category.objects.create(name='Gul', slug='gul')
+        self.syrup = Category.objects.create(name='Syrups', slug='syrups')
+        self.rose = Product.objects.create(category=self.gul, name='Rose', slug='rose', price=10)
+        Product.objects.create(category=self.syrup, name='Kokum', slug='kokum', price=5)
+
+    def test_reads_are_cached_until_a_product_is_saved(self):
+        self.assertEqual(len(catalog.get_featured_products()), 2)
+        version = catalog.get_version()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(catalog.get_featured_products()), 2)
+
+        self.rose.available = False
+        self.rose.save()
+        self.assertEqual(catalog.get_version(), version + 1)
+        with self.assertNumQueries(1):
+            self.assertEqual([p.slug for p in catalog.get_featured_products()], ['kokum'])
+
+    def test_category_and_delete_invalidate(self):
+        self.assertEqual([c.name for c in catalog.get_categories()], ['Gul', 'Syrups'])
+        self.gul.name = 'Gulkand'
+        self.gul.save()
+        self.assertEqual(catalog.get_category('gul').name, 'Gulkand')
+
+        page = catalog.get_product_page(self.syrup)
+        self.assertEqual(len(page), 1)
+        Product.objects.filter(slug='kokum').delete()
+        self.assertEqual(len(catalog.get_product_page(self.syrup)), 0)
+
+    def test_hits_and_misses_are_counted(self):
+        before = catalog.get_stats()
+        catalog.get_categories()
+        catalog.get_categories()
+        after = catalog.get_stats()
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (1, 1))
+
+    def test_warm_fills_every_listing(self):
+        self.assertEqual(catalog.warm(), 2)
+        with self.assertNumQueries(0):
+            catalog.get_categories()
+            catalog.get_featured_products()
+            for sort in SORTS:
+                self.assertEqual(len(catalog.get_product_page(sort=sort)), 2)
+                for category in (self.gul, self.syrup):
+                    self.assertEqual(len(catalog.get_product_page(category, sort=sort)), 1)
+        # An anonymous visitor's listing page is served from the cache alone
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('products:product_list')).status_code, 200)
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Gul', slug='gul')
+        Product.objects.bulk_create(
+            Product(category=category, name=f'Item {n}', slug=f'item-{n}', price=[5, 10, 10, 10, 20][n % 5])
+            for n in range(13)
+        )
+        # Ties on both sort fields: four products share each created instant
+        moment = timezone.now().replace(microsecond=0)
+        for n, product in enumerate(Product.objects.order_by('pk')):
+            Product.objects.filter(pk=product.pk).update(created=moment - timedelta(seconds=n // 4))
+
+    def walk(self, sort, per_page=3):
+        seen, cursor = [], None
+        while True:
+            page = paginate(Product.objects.all(), sort, cursor, per_page)
+            seen += [product.pk for product in page]
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_product_once_in_order(self):
+        expected = {
+            'newest': list(Product.objects.order_by('-created', '-id').values_list('pk', flat=True)),
+            'price': list(Product.objects.order_by('price', 'id').values_list('pk', flat=True)),
+        }
+        for sort in SORTS:
+            for per_page in (1, 2, 3, 4, 13, 20):
+                with self.subTest(sort=sort, per_page=per_page):
+                    self.assertEqual(self.walk(sort, per_page), expected[sort])
+
+    def test_cursor_round_trip(self):
+        product = Product.objects.order_by('pk').last()
+        for sort, field in (('newest', 'created'), ('price', 'price')):
+            value = getattr(product, field)
+            self.assertEqual(decode_cursor(encode_cursor(value, product.pk), sort), (value, product.pk))
+
+    def test_malformed_cursor_falls_back_to_the_first_page(self):
+        token = lambda raw: base64.urlsafe_b64encode(raw).decode()
+        junk = {
+            'price': ['garbage!', token(b'{}'), token(b'[1]'), encode_cursor('cheap', 1),
+                      encode_cursor('NaN', 1), encode_cursor('10', 'x'), 'A' * (MAX_CURSOR_LENGTH + 1)],
+            'newest': [encode_cursor('soon', 1), encode_cursor('10', 1)],
+        }
+        for sort, cursors in junk.items():
+            first = [product.pk for product in paginate(Product.objects.all(), sort, None, 3)]
+            for cursor in cursors:
+                with self.subTest(sort=sort, cursor=cursor):
+                    self.assertIsNone(decode_cursor(cursor, sort))
+                    self.assertEqual([product.pk for product in paginate(Product.objects.all(), sort, cursor, 3)], first)
+        response = self.client.get(reverse('products:product_list'), {'sort': 'price', 'cursor': 'garbage!'})
+        self.assertEqual(response.status_code, 200)
+
+class ProductDetailCacheTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Gul', slug='gul')
+        self.product = Product.objects.create(category=category, name='Rose', slug='rose', price=10)
+        self.url = reverse('products:product_detail', args=[self.product.pk, self.product.slug])
+
+    def test_unchanged_page_is_not_modified(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        # The first response set the CSRF cookie; revalidating must still match
+        self.assertIn('csrftoken', self.client.cookies)
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_no_304_without_a_csrf_cookie(self):
+        etag = self.client.get(self.url)['ETag']
+        del self.client.cookies['csrftoken']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_product_edit_changes_the_page(self):
+        etag = self.client.get(self.url)['ETag']
+        self.product.price = 12
+        self.product.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.context['product'].price, 12)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_missing_products_are_cached_too(self):
+        missing = self.product.pk + 1
+        self.assertIsNone(catalog.get_product(missing))
+        with self.assertNumQueries(0):
+            self.assertIsNone(catalog.get_product(missing))
+        created = Product.objects.create(category=self.product.category, name='Tulip', slug='tulip', price=5)
+        self.assertEqual(created.pk, missing)
+        self.assertEqual(catalog.get_product(missing), created)
@@ -10,6 +10,7 @@ urlpatterns = [
     path('products/', views.product_list, name='product_list'),
     path('products/<slug:category_slug>/', views.product_list, name='product_list_by_category'),
     path('product/<int:id>/<slug:slug>/', views.product_detail, name='product_detail'),
+    path('search/', views.search_view, name='search'),
     
     # Cart URLs
     path('cart/', views.cart_detail, name='cart_detail'),
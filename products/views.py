@@ -1,12 +1,22 @@
 # products/views.py
+import hashlib
+
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from .models import Product, Category
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from accounts import wishlist
+from cart.cart import Cart
+from . import catalog, search
+from .models import Product
+from .pagination import DEFAULT_SORT, SORTS
 
 def home_view(request):
     """Home page view"""
-    featured_products = Product.objects.filter(available=True)[:4]
-    categories = Category.objects.all()
+    featured_products = catalog.get_featured_products(4)
+    categories = catalog.get_categories()
     
     return render(request, 'products/home.html', {
         'featured_products': featured_products,
@@ -14,44 +24,101 @@ def home_view(request):
         'title': 'Home - Premium Jaggery Shop'
     })
 
+def _product_version(product):
+    """Changes whenever the rendered product body would change"""
+    return '{}:{}:{}:{}:{}'.format(
+        getattr(settings, 'PRODUCT_DETAIL_TEMPLATE_VERSION', 1),
+        product.pk,
+        product.updated.timestamp(),
+        product.category_id,
+        product.category.name,
+    )
+
+def _product_detail_etag(request, body_version, is_in_wishlist):
+    """
+    ETag for the whole page, including the per-user bits, or None when the
+    page must be rendered (pending flash messages are shown only once).
+    """
+    if len(messages.get_messages(request)):
+        return None
+    parts = [
+        body_version,
+        request.user.pk if request.user.is_authenticated else '',
+        is_in_wishlist,
+        len(Cart(request)),
+    ]
+    digest = hashlib.md5(':'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest()
+    return quote_etag(digest)
+
 def product_detail(request, id, slug):
     """Product detail view"""
-    product = get_object_or_404(Product, id=id, slug=slug)
+    product = catalog.get_product(id)
+    if product is None or product.slug != slug:
+        raise Http404('No Product matches the given query.')
+    
+    # One index lookup on (user, product)
+    is_in_wishlist = wishlist.contains(request.user, product.id)
     
-    # Check if product is in wishlist
-    is_in_wishlist = False
-    if request.user.is_authenticated:
-        # Check session-based wishlist
-        if 'wishlist' in request.session:
-            wishlist_items = request.session['wishlist']
-            if isinstance(wishlist_items, list) and str(product.id) in wishlist_items:
-                is_in_wishlist = True
+    body_version = _product_version(product)
+    etag = _product_detail_etag(request, body_version, is_in_wishlist)
+    last_modified = int(product.updated.timestamp())
+    # The cached page's forms carry a CSRF token for the cookie it was
+    # rendered with. That cookie only changes on login, which changes the
+    # user part of the ETag; without one, render so a cookie gets set.
+    if etag and settings.CSRF_COOKIE_NAME in request.COOKIES:
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
     
-    return render(request, 'products/product_detail.html', {
+    response = render(request, 'products/product_detail.html', {
         'product': product,
-        'is_in_wishlist': is_in_wishlist
+        'is_in_wishlist': is_in_wishlist,
+        'body_version': body_version,
     })
+    if etag:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    # Per-user page: never store in shared caches, always revalidate
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 def product_list(request, category_slug=None):
     """Product list view"""
     category = None
-    categories = Category.objects.all()
-    products = Product.objects.filter(available=True)
+    categories = catalog.get_categories()
     
     if category_slug:
-        category = get_object_or_404(Category, slug=category_slug)
-        products = products.filter(category=category)
+        category = catalog.get_category(category_slug)
+        if category is None:
+            raise Http404('No Category matches the given query.')
+    
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    if sort not in SORTS:
+        sort = DEFAULT_SORT
+    page = catalog.get_product_page(category, sort=sort, cursor=request.GET.get('cursor'))
     
     return render(request, 'products/product_list.html', {
         'category': category,
         'categories': categories,
-        'products': products
+        'products': page,
+        'page': page,
+        'sort': sort,
+    })
+
+def search_view(request):
+    """Product search results"""
+    query = request.GET.get('q', '').strip()
+    results = search.search(query) if query else []
+    
+    return render(request, 'products/search.html', {
+        'query': query,
+        'results': results,
     })
 
 # ===== CART FUNCTIONS =====
 def add_to_cart(request, product_id):
     """
-    Add product to cart (session-based)
+    Add product to cart (session, or saved cart for signed-in users)
     Supports both POST (Add to Cart) and GET (Buy Now)
     """
     try:
@@ -71,28 +138,7 @@ def add_to_cart(request, product_id):
             messages.error(request, 'Quantity must be between 1 and 10')
             return redirect('products:product_detail', id=product_id, slug=product.slug)
         
-        # Get or initialize cart in session
-        cart = request.session.get('cart', {})
-        
-        # Add product to cart - STORE AS INTEGER
-        product_key = str(product_id)
-        
-        # FIX: Handle if cart item is dictionary (old format)
-        if product_key in cart:
-            if isinstance(cart[product_key], dict):
-                # If it's a dictionary, get quantity from it
-                old_quantity = cart[product_key].get('quantity', 0)
-                cart[product_key] = old_quantity + quantity
-            else:
-                # If it's an integer, add normally
-                cart[product_key] += quantity
-        else:
-            # New item, store as integer
-            cart[product_key] = quantity
-        
-        # Save cart to session
-        request.session['cart'] = cart
-        request.session.modified = True
+        Cart(request).add(product, quantity)
         
         messages.success(request, f'✅ Added {quantity} {product.name} to cart!')
         
@@ -116,49 +162,18 @@ def add_to_cart(request, product_id):
 
 def cart_detail(request):
     """
-    Display cart items - FIXED VERSION
+    Display cart items
     """
-    cart = request.session.get('cart', {})
-    
-    # Get products from cart
-    cart_items = []
-    total_price = 0
-    total_items = 0
+    cart = Cart(request)
+    snapshot = cart.snapshot()
     
-    for product_id, cart_item in cart.items():  # Changed 'quantity' to 'cart_item'
-        try:
-            product = Product.objects.get(id=int(product_id))
-            
-            # FIX: Check if cart_item is dict or int
-            if isinstance(cart_item, dict):
-                # If it's a dictionary, get quantity from it
-                quantity = cart_item.get('quantity', 1)
-            else:
-                # If it's an integer, use directly
-                quantity = cart_item
-            
-            # Calculate item total
-            item_total = product.price * quantity
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'total': item_total
-            })
-            total_price += item_total
-            total_items += quantity
-        except (Product.DoesNotExist, ValueError):
-            # Remove invalid product from cart
-            cart.pop(product_id, None)
-    
-    # Update session if invalid products were removed
-    if cart:
-        request.session['cart'] = cart
-        request.session.modified = True
+    # Remove invalid products from cart
+    cart.discard(snapshot.missing_keys)
     
     context = {
-        'cart_items': cart_items,
-        'total_price': total_price,
-        'total_items': total_items,
+        'cart_items': snapshot.lines,
+        'total_price': snapshot.total_price,
+        'total_items': snapshot.total_items,
     }
     
     return render(request, 'cart/detail.html', context)
@@ -167,19 +182,17 @@ def remove_from_cart(request, product_id):
     """
     Remove item from cart
     """
-    cart = request.session.get('cart', {})
+    cart = Cart(request)
     product_key = str(product_id)
     
-    if product_key in cart:
+    if product_key in cart.cart:
         try:
             product = Product.objects.get(id=product_id)
             messages.info(request, f'Removed {product.name} from cart')
         except Product.DoesNotExist:
             messages.info(request, 'Item removed from cart')
         
-        del cart[product_key]
-        request.session['cart'] = cart
-        request.session.modified = True
+        cart.discard([product_key])
     
     return redirect('products:cart_detail')
 
@@ -187,43 +200,24 @@ def clear_cart(request):
     """
     Clear all items from cart
     """
-    if 'cart' in request.session:
-        del request.session['cart']
+    cart = Cart(request)
+    if cart.cart:
+        cart.clear()
         messages.info(request, 'Cart cleared')
     
     return redirect('products:cart_detail')
 
 def update_cart_quantity(request, product_id):
     """
-    Update quantity of a cart item
+    Update quantity of a cart item (a single-row UPDATE for saved carts)
     """
     if request.method == 'POST':
-        cart = request.session.get('cart', {})
-        product_key = str(product_id)
-        
         action = request.POST.get('update')
         
-        if product_key in cart:
-            # Get current quantity
-            if isinstance(cart[product_key], dict):
-                current_qty = cart[product_key].get('quantity', 1)
-            else:
-                current_qty = cart[product_key]
-            
-            # Update based on action
-            if action == 'increase':
-                new_qty = current_qty + 1
-                if new_qty <= 10:
-                    cart[product_key] = new_qty
-            elif action == 'decrease':
-                new_qty = current_qty - 1
-                if new_qty >= 1:
-                    cart[product_key] = new_qty
-                else:
-                    # Remove if quantity becomes 0
-                    del cart[product_key]
-            
-            request.session['cart'] = cart
-            request.session.modified = True
+        if action == 'increase':
+            Cart(request).change_quantity(product_id, 1)
+        elif action == 'decrease':
+            # Removes the item once its quantity would reach 0
+            Cart(request).change_quantity(product_id, -1)
     
-    return redirect('products:cart_detail')
\ No newline at end of file
+    return redirect('products:cart_detail')